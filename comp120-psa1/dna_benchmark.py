@@ -0,0 +1,207 @@
+"""
+Module: dna_benchmark
+
+Benchmarks for dna_profiler on synthetic data of realistic sizes. Sequences and
+profile databases are generated from a seed, so runs are repeatable and their
+JSON results can be compared over time.
+
+Authors:
+    1) Cavin Nguyen - cavinnguyen@sandiego.edu
+    2) Sawyer Dentz - sdentz@sandiego.edu
+"""
+
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from sys import argv
+from typing import Any, Callable
+
+import dna_profiler
+
+
+def generate_strs(num_strs: int, seed: int = 0, length: int = 4) -> list[str]:
+    """
+    Generates distinct random STRs.
+
+    Parameters: num_strs (int) - The number of STRs to generate.
+    seed (int) - The random seed.
+    length (int) - The length of each STR.
+
+    Returns: (list) The STRs.
+
+    >>> generate_strs(3, seed=1)
+    ['ATTC', 'CCGT', 'AATC']
+    """
+    rng = random.Random(seed)
+    strs = {} # used as an ordered set, so the STRs are distinct
+    while len(strs) < num_strs:
+        strs["".join(rng.choices("ACGT", k=length))] = None
+    return list(strs)
+
+
+def generate_sequence(length: int, planted_runs: dict[str, int], seed: int = 0) -> str:
+    """
+    Generates a random DNA sequence with a run of each given STR planted at a random position.
+
+    Parameters: length (int) - The number of random bases around the planted runs.
+    planted_runs (dict) - Each STR to plant and how many times it repeats.
+    seed (int) - The random seed.
+
+    Returns: (str) The sequence.
+
+    >>> sequence = generate_sequence(1000, {"AGAT": 12, "AATG": 9}, seed=2)
+    >>> len(sequence)
+    1084
+    >>> dna_profiler.find_max_consecutive(sequence, "AGAT") >= 12
+    True
+    """
+    rng = random.Random(seed)
+    pieces = ["".join(rng.choices("ACGT", k=length))]
+
+    # plant each run by splitting a random piece at a random position
+    for target, repeats in planted_runs.items():
+        index = rng.randrange(len(pieces))
+        position = rng.randint(0, len(pieces[index]))
+        piece = pieces[index]
+        pieces[index:index + 1] = [piece[:position], target * repeats, piece[position:]]
+    return "".join(pieces)
+
+
+def generate_profiles(profiles_filename: str, strs: list[str], num_people: int, max_count: int = 40,
+                      seed: int = 0) -> None:
+    """
+    Writes a random profile database in the dna_database.csv format.
+
+    Parameters: profiles_filename (str) - The CSV file to write.
+    strs (list) - The STRs, in header order.
+    num_people (int) - The number of people.
+    max_count (int) - The largest count to give any STR.
+    seed (int) - The random seed.
+
+    >>> import os, tempfile
+    >>> profiles_filename = os.path.join(tempfile.mkdtemp(), "profiles.csv")
+    >>> generate_profiles(profiles_filename, ["AGAT", "AATG"], 2, seed=3)
+    >>> print(open(profiles_filename).read(), end="")
+    name,AGAT,AATG
+    Person0,15,37
+    Person1,34,8
+    """
+    rng = random.Random(seed)
+    with open(profiles_filename, "w") as out_f:
+        out_f.write(",".join(["name"] + strs) + "\n")
+        for person in range(num_people):
+            out_f.write(",".join([f"Person{person}"] + [str(rng.randint(0, max_count)) for target in strs]) + "\n")
+
+
+def time_phase(function: Callable[[], Any], repeats: int) -> float:
+    """
+    Times a function, keeping the best of several runs to reduce noise.
+
+    Parameters: function (Callable) - The function to time, taking no arguments.
+    repeats (int) - The number of times to run it.
+
+    Returns: (float) The fastest run, in seconds.
+    """
+    best = float("inf")
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_startup() -> None:
+    """
+    Starts a fresh Python process that imports dna_profiler and exits, so timing it measures what every command
+    line call pays before doing any work.
+    """
+    subprocess.run([sys.executable, "-c", "import dna_profiler"], check=True,
+                   cwd=os.path.dirname(os.path.abspath(dna_profiler.__file__)))
+
+
+def run_benchmarks(sequence_length: int, num_people: int, num_strs: int, repeats: int = 3,
+                   seed: int = 0) -> dict[str, Any]:
+    """
+    Generates a sequence and a profile database, then times each phase of dna_profiler on them separately.
+
+    Parameters: sequence_length (int) - The number of random bases in the sequence.
+    num_people (int) - The number of people in the profile database.
+    num_strs (int) - The number of STRs in the profile database.
+    repeats (int) - The number of times to run each phase (the fastest run is kept).
+    seed (int) - The random seed.
+
+    Returns: (dict) The parameters, environment and the time of each phase in seconds.
+
+    >>> results = run_benchmarks(2000, 50, 4, repeats=1)
+    >>> sorted(results["seconds"])
+    ['create_dna_profiles', 'find_max_consecutive', 'identify_dna', 'read_dna_sequence', 'startup']
+    >>> results["identified"]
+    'Person0'
+    """
+    rng = random.Random(seed)
+    strs = generate_strs(num_strs, seed)
+
+    # plant the first person's counts in the sequence, so identify_dna has a match to find
+    planted_runs = {target: rng.randint(20, 40) for target in strs}
+    sequence = generate_sequence(sequence_length, planted_runs, seed)
+    planted_runs = {target: dna_profiler.find_max_consecutive(sequence, target) for target in strs}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        sequence_filename = os.path.join(workdir, "sequence.txt")
+        profiles_filename = os.path.join(workdir, "profiles.csv")
+        with open(sequence_filename, "w") as out_f:
+            out_f.write(sequence + "\n")
+        generate_profiles(profiles_filename, strs, num_people, seed=seed)
+        with open(profiles_filename, "r") as in_f:
+            lines = in_f.readlines()
+        lines[1] = ",".join(["Person0"] + [str(planted_runs[target]) for target in strs]) + "\n"
+        with open(profiles_filename, "w") as out_f:
+            out_f.writelines(lines)
+
+        dna_profiles = dna_profiler.create_dna_profiles(profiles_filename)
+        seconds = {
+            "read_dna_sequence": time_phase(lambda: dna_profiler.read_dna_sequence(sequence_filename), repeats),
+            "create_dna_profiles": time_phase(lambda: dna_profiler.create_dna_profiles(profiles_filename), repeats),
+            "find_max_consecutive": time_phase(
+                lambda: [dna_profiler.find_max_consecutive(sequence, target) for target in strs], repeats),
+            "identify_dna": time_phase(lambda: dna_profiler.identify_dna(sequence, dna_profiles), repeats),
+            "startup": time_phase(time_startup, repeats),
+        }
+        identified = dna_profiler.identify_dna(sequence, dna_profiles)
+
+    return {
+        "parameters": {"sequence_length": len(sequence), "num_people": num_people, "num_strs": num_strs,
+                       "repeats": repeats, "seed": seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")},
+        "seconds": seconds,
+        "identified": identified,
+    }
+
+
+def main(output_filename: str, sequence_length: int = 1_000_000, num_people: int = 10_000,
+         num_strs: int = 20) -> None:
+    """
+    Runs the benchmarks and writes the results as JSON.
+
+    Parameters: output_filename (str) - The JSON file to write.
+    sequence_length (int) - The number of random bases in the sequence.
+    num_people (int) - The number of people in the profile database.
+    num_strs (int) - The number of STRs in the profile database.
+    """
+    results = run_benchmarks(sequence_length, num_people, num_strs)
+    with open(output_filename, "w") as out_f:
+        json.dump(results, out_f, indent=2)
+    for phase, seconds in results["seconds"].items():
+        print(f"{phase}: {seconds:.4f} s")
+
+if __name__ == "__main__":
+    if len(argv) >= 2:
+        main(argv[1], *(int(arg) for arg in argv[2:5]))
+    else:
+        print("Error: not enough terminal arguments specified.")
@@ -0,0 +1,116 @@
+"""
+Module: dna_cache
+
+An on-disk cache of the STR counts dna_profiler finds in sequence files, so a sequence queried again is not
+rescanned for the STRs already counted in it.
+
+    python dna_profiler.py bob.txt dna_database.csv counts.db
+
+Authors:
+    1) Cavin Nguyen - cavinnguyen@sandiego.edu
+    2) Sawyer Dentz - sdentz@sandiego.edu
+"""
+
+import hashlib
+import os
+import sqlite3
+
+import dna_profiler
+
+
+class STRCountCache:
+    """
+    An on-disk cache of the STR counts of sequence files, kept in a SQLite database. Counts are stored per sample
+    and STR, so a later query only scans a sequence for the STRs the cache has not seen. The least recently used
+    entries are dropped once the cache holds more than max_entries counts.
+    """
+
+    max_entries: int  # the most (sample, STR) counts kept
+    by_content: bool  # whether samples are keyed by a hash of their contents, rather than their path, mtime and size
+    _connection: sqlite3.Connection  # the open cache database
+    _clock: int  # increases with every use, to order entries from least to most recently used
+
+    def __init__(self, cache_filename: str, max_entries: int = 1_000_000, by_content: bool = True) -> None:
+        """
+        Opens the cache, creating it if needed.
+
+        Parameters: cache_filename (str) - The SQLite file holding the cache.
+        max_entries (int) - The most (sample, STR) counts to keep.
+        by_content (bool) - Key samples by a hash of their contents (True), or by path, mtime and size (False).
+        """
+        self.max_entries = max_entries
+        self.by_content = by_content
+        self._connection = sqlite3.connect(cache_filename)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS counts (sample TEXT, str TEXT, count INTEGER, "
+                                 "used INTEGER, PRIMARY KEY (sample, str))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS counts_used ON counts (used)")
+        self._clock = self._connection.execute("SELECT COALESCE(MAX(used), 0) FROM counts").fetchone()[0]
+
+    def sample_key(self, sequence_filename: str) -> str:
+        """
+        Works out the key a sequence file's counts are stored under.
+
+        Parameters: sequence_filename (str) - filename of the DNA sequence
+
+        Returns: (str) A SHA-256 of the file's contents, or its absolute path, mtime and size.
+        """
+        if not self.by_content:
+            stat = os.stat(sequence_filename)
+            return f"{os.path.abspath(sequence_filename)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+        digest = hashlib.sha256()
+        with open(sequence_filename, "rb") as in_f:
+            for block in iter(lambda: in_f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def count_strs(self, sequence_filename: str, strs: list[str]) -> dict[str, int]:
+        """
+        Finds the maximum consecutive count of each STR in a sequence file, scanning the file only for STRs whose
+        counts are not already cached.
+
+        Parameters: sequence_filename (str) - filename of the DNA sequence
+        strs (list) - The STRs to count.
+
+        Returns: (dict) A dictionary with each STR as the key and its maximum consecutive count as the value.
+
+        >>> import os, tempfile
+        >>> cache = STRCountCache(os.path.join(tempfile.mkdtemp(), "counts.db"), max_entries=4)
+        >>> cache.count_strs("alice.txt", ["AGAT", "AATG"])
+        {'AGAT': 5, 'AATG': 2}
+        >>> cache.count_strs("alice.txt", ["TATC", "AGAT", "AATG"])
+        {'TATC': 8, 'AGAT': 5, 'AATG': 2}
+        >>> cache.count_strs("bob.txt", ["AGAT", "AATG"])
+        {'AGAT': 3, 'AATG': 7}
+        >>> len(cache)
+        4
+        >>> cache.close()
+        """
+        sample = self.sample_key(sequence_filename)
+        placeholders = ",".join("?" * len(strs))
+        counts = dict(self._connection.execute(
+            f"SELECT str, count FROM counts WHERE sample = ? AND str IN ({placeholders})", [sample, *strs]))
+
+        # only scan the sequence for the STRs that missed
+        missing = [target for target in strs if target not in counts]
+        if missing:
+            counts.update(dna_profiler.find_max_consecutive_in_chunks(dna_profiler.read_dna_chunks(sequence_filename),
+                                                                      missing))
+
+        self._clock += 1
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO counts VALUES (?, ?, ?, ?)",
+                                         [(sample, target, counts[target], self._clock) for target in strs])
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._connection.execute("DELETE FROM counts WHERE rowid IN "
+                                         "(SELECT rowid FROM counts ORDER BY used LIMIT ?)", (excess,))
+        return {target: counts[target] for target in strs}
+
+    def __len__(self) -> int:
+        """ Returns the number of (sample, STR) counts in the cache. """
+        return self._connection.execute("SELECT COUNT(*) FROM counts").fetchone()[0]
+
+    def close(self) -> None:
+        """ Closes the cache database. """
+        self._connection.close()
@@ -0,0 +1,182 @@
+"""
+Module: dna_daemon
+
+A long-running dna_profiler server, which loads the profile database once and answers identify requests
+over a Unix socket or localhost TCP.
+
+    python dna_profiler.py --daemon dna_database.csv 127.0.0.1:8765
+
+Authors:
+    1) Cavin Nguyen - cavinnguyen@sandiego.edu
+    2) Sawyer Dentz - sdentz@sandiego.edu
+"""
+
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sys import stderr
+
+import dna_profiler
+
+
+class ProfilingDaemon:
+    """
+    A long-running server that holds a loaded profile database and answers identify requests over a Unix socket
+    or localhost TCP, so each query skips interpreter startup and database loading. STR counting runs in a process
+    pool so the event loop stays free to accept more requests.
+
+    Requests and responses are one JSON object per line. A request names a sequence file {"sequence_filename": ...}
+    or carries the sequence itself {"sequence": ...}. The response gives the "result", the request's "latency_ms"
+    and the "queue_depth" (requests being counted) when it arrived; errors come back as {"error": ...}.
+    """
+
+    dna_profiles: dna_profiler.ProfileStore  # the loaded profile database
+    line_limit: int  # the longest request line accepted, in bytes
+    queue_depth: int  # the number of requests whose STRs are being counted
+    requests: int  # the number of requests answered
+
+    def __init__(self, dna_profiles: dna_profiler.ProfileStore, workers: int | None = None,
+                 line_limit: int = 1 << 28) -> None:
+        """
+        Creates the daemon.
+
+        Parameters: dna_profiles (ProfileStore) - The loaded profile database.
+        workers (int) - The number of worker processes, or None for one per CPU.
+        line_limit (int) - The longest request line accepted, in bytes, which bounds an inline sequence.
+        """
+        self.dna_profiles = dna_profiles
+        self.line_limit = line_limit
+        self.queue_depth = 0
+        self.requests = 0
+        # spawned workers, unlike forked ones, do not inherit the open client sockets and keep them from closing
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def identify(self, request: dict[str, str]) -> dict[str, object]:
+        """
+        Answers one request.
+
+        Parameters: request (dict) - The decoded request.
+
+        Returns: (dict) The response.
+        """
+        start_time = time.perf_counter()
+        queue_depth = self.queue_depth
+        loop = asyncio.get_running_loop()
+
+        self.queue_depth += 1
+        try:
+            if "sequence_filename" in request:
+                sequence_filename, mystery_profile, bases = await loop.run_in_executor(
+                    self._pool, dna_profiler._count_sequence_file, request["sequence_filename"],
+                    self.dna_profiles.strs)
+            else:
+                mystery_profile = await loop.run_in_executor(
+                    self._pool, dna_profiler.find_all_max_consecutive, request["sequence"],
+                    self.dna_profiles.strs)
+        finally:
+            self.queue_depth -= 1
+
+        self.requests += 1
+        return {"result": self.dna_profiles.identify(mystery_profile),
+                "latency_ms": round((time.perf_counter() - start_time) * 1000, 3), "queue_depth": queue_depth}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one connection, answering each request line in turn. A line longer than line_limit is answered
+        with an error and the connection is closed, since the rest of that line cannot be told apart from the
+        next request.
+
+        Parameters: reader (StreamReader) - The connection's incoming side.
+        writer (StreamWriter) - The connection's outgoing side.
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as error:
+                    response = {"error": f"request longer than {self.line_limit} bytes: {error}"}
+                    writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    response = await self.identify(json.loads(line))
+                except Exception as error:
+                    response = {"error": f"{type(error).__name__}: {error}"}
+                else:
+                    print(f"{response['result']} in {response['latency_ms']} ms "
+                          f"(queue depth {response['queue_depth']})", file=stderr)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, address: str) -> asyncio.AbstractServer:
+        """
+        Starts listening.
+
+        Parameters: address (str) - "host:port" for TCP, or the path of a Unix socket.
+
+        Returns: (AbstractServer) The listening server.
+
+        >>> async def demo():
+        ...     daemon = ProfilingDaemon(dna_profiler.create_profile_index("dna_database.csv"), 1)
+        ...     server = await daemon.start("127.0.0.1:0")
+        ...     reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+        ...     responses = []
+        ...     long_request = json.dumps({"sequence": dna_profiler.read_dna_sequence("bob.txt") * 1000})
+        ...     for request in ['{"sequence_filename": "bob.txt"}', '{"sequence": "AGATAGAT"}', 'nonsense', long_request]:
+        ...         writer.write(request.encode() + b"\\n")
+        ...         responses.append(json.loads(await reader.readline()))
+        ...     writer.close()
+        ...     await writer.wait_closed()
+        ...     server.close()
+        ...     daemon.close()
+        ...     return responses
+        >>> responses = asyncio.run(demo())
+        >>> [response.get("result", "error" in response) for response in responses]
+        ['Bob', 'No match', True, 'Bob']
+        """
+        # start a worker before the first request arrives, so it does not pay for the process startup
+        await asyncio.get_running_loop().run_in_executor(self._pool, dna_profiler.find_all_max_consecutive,
+                                                         "", [])
+
+        host, colon, port = address.rpartition(":")
+        if colon and port.isdigit():
+            return await asyncio.start_server(self.handle, host, int(port), limit=self.line_limit)
+        return await asyncio.start_unix_server(self.handle, address, limit=self.line_limit)
+
+    async def serve(self, address: str) -> None:
+        """
+        Listens on the address and serves requests until cancelled.
+
+        Parameters: address (str) - "host:port" for TCP, or the path of a Unix socket.
+        """
+        server = await self.start(address)
+        print(f"Serving {len(self.dna_profiles.strs)} STRs on {address}", file=stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        """ Shuts down the worker processes. """
+        self._pool.shutdown()
+
+
+def daemon_main(profiles_filename: str, address: str, workers: int | None = None) -> None:
+    """
+    This function loads the profile database once and serves identify requests until interrupted.
+
+    Parameters: profiles_filename (str) - filename of the dna database, either the CSV or compiled with --compile
+    address (str) - "host:port" for TCP, or the path of a Unix socket.
+    workers (int) - The number of worker processes, or None for one per CPU.
+    """
+    daemon = ProfilingDaemon(dna_profiler.load_profiles(profiles_filename), workers)
+    try:
+        asyncio.run(daemon.serve(address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
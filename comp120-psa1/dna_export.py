@@ -0,0 +1,168 @@
+"""
+Module: dna_export
+
+Exports of the STR counts found by a dna_profiler batch run, as a columnar binary file with a CSV view of the
+same counts, and readers for them.
+
+    python dna_profiler.py --batch samples/ dna_database.csv 4 counts.bin
+
+Authors:
+    1) Cavin Nguyen - cavinnguyen@sandiego.edu
+    2) Sawyer Dentz - sdentz@sandiego.edu
+"""
+
+import os
+import struct
+from array import array
+from typing import Iterator
+
+
+_EXPORT_MAGIC = b"DNACNT01"
+_EXPORT_HEADER = struct.Struct("=8sII")
+_EXPORT_GROUP_HEADER = struct.Struct("=II")
+
+
+class ProfileExporter:
+    """
+    Writes the STR counts of each identified sample to a columnar binary file, with a CSV view of the same counts
+    alongside. Samples are buffered into row groups; each full group is written as a block of name offsets, the
+    names, then one column of counts per STR, so a reader can pull out single STRs without touching the rest.
+    Every CSV row and every finished group is flushed as it is written, so other jobs can read the files while a
+    batch is still running.
+    """
+
+    strs: list[str]  # the STRs, in column order
+    group_size: int  # the number of samples in each row group
+    _names: list[str]  # the samples buffered for the next row group
+    _columns: list[array]  # the buffered counts, one column per STR
+
+    def __init__(self, export_filename: str, csv_filename: str, strs: list[str], group_size: int = 1024) -> None:
+        """
+        Creates the export files and writes their headers.
+
+        Parameters: export_filename (str) - The binary file to write.
+        csv_filename (str) - The CSV file to write.
+        strs (list) - The STRs, in column order.
+        group_size (int) - The number of samples in each row group.
+        """
+        self.strs = list(strs)
+        self.group_size = group_size
+        self._names = []
+        self._columns = [array("I") for target in self.strs]
+
+        strs_bytes = ",".join(self.strs).encode("ascii")
+        self._out_f = open(export_filename, "wb")
+        self._out_f.write(_EXPORT_HEADER.pack(_EXPORT_MAGIC, len(self.strs), len(strs_bytes)) + strs_bytes)
+        self._out_f.flush()
+        self._csv_f = open(csv_filename, "w")
+        self._csv_f.write(",".join(["sample"] + self.strs) + "\n")
+        self._csv_f.flush()
+
+    def write(self, sample: str, mystery_profile: dict[str, int]) -> None:
+        """
+        Adds one sample's counts to the export.
+
+        Parameters: sample (str) - The sample's name, such as its sequence filename.
+        mystery_profile (dict) - The maximum consecutive count of each STR in the sample.
+        """
+        counts = [mystery_profile[target] for target in self.strs]
+        self._csv_f.write(",".join([sample] + [str(count) for count in counts]) + "\n")
+        self._csv_f.flush()
+
+        self._names.append(sample)
+        for column, count in zip(self._columns, counts):
+            column.append(count)
+        if len(self._names) >= self.group_size:
+            self._write_group()
+
+    def _write_group(self) -> None:
+        """ Writes the buffered samples as a row group and empties the buffer. """
+        names = bytearray() # every name, one after another
+        name_offsets = array("I", [0]) # where each name starts in names, plus where the last one ends
+        for name in self._names:
+            names += name.encode("utf-8")
+            name_offsets.append(len(names))
+
+        self._out_f.write(_EXPORT_GROUP_HEADER.pack(len(self._names), len(names)))
+        name_offsets.tofile(self._out_f)
+        self._out_f.write(names)
+        for column in self._columns:
+            column.tofile(self._out_f)
+        self._out_f.flush()
+
+        self._names = []
+        self._columns = [array("I") for target in self.strs]
+
+    def close(self) -> None:
+        """ Writes any buffered samples and closes both files. """
+        if self._names:
+            self._write_group()
+        self._out_f.close()
+        self._csv_f.close()
+
+
+def read_exported_columns(export_filename: str, strs: list[str] | None = None) -> tuple[list[str], dict[str, array]]:
+    """
+    This function reads the counts written by ProfileExporter back as columns, skipping over the STRs that are
+    not asked for.
+
+    Parameters: export_filename (str) - A file written by ProfileExporter.
+    strs (list) - The STRs to read, or None for all of them.
+
+    Returns: (tuple) The sample names, and each STR's column of counts (in the same order as the names).
+
+    Raises: ValueError - If the file was not written by ProfileExporter.
+
+    >>> import os, tempfile
+    >>> workdir = tempfile.mkdtemp()
+    >>> exporter = ProfileExporter(os.path.join(workdir, "counts.bin"), os.path.join(workdir, "counts.csv"),
+    ...                            ["AGAT", "AATG"], group_size=2)
+    >>> for sample, profile in [("a", {'AGAT': 5, 'AATG': 2}), ("b", {'AGAT': 3, 'AATG': 7}), ("c", {'AGAT': 6, 'AATG': 1})]:
+    ...     exporter.write(sample, profile)
+    >>> exporter.close()
+    >>> read_exported_columns(os.path.join(workdir, "counts.bin"), ["AATG"])
+    (['a', 'b', 'c'], {'AATG': array('I', [2, 7, 1])})
+    >>> print(open(os.path.join(workdir, "counts.csv")).read(), end="")
+    sample,AGAT,AATG
+    a,5,2
+    b,3,7
+    c,6,1
+    """
+    with open(export_filename, "rb") as in_f:
+        magic, num_strs, strs_size = _EXPORT_HEADER.unpack(in_f.read(_EXPORT_HEADER.size))
+        if magic != _EXPORT_MAGIC:
+            raise ValueError(f"{export_filename} is not an exported profiles file")
+        all_strs = in_f.read(strs_size).decode("ascii").split(",") if num_strs else []
+        wanted = all_strs if strs is None else strs
+
+        names = []
+        columns = {target: array("I") for target in wanted}
+        while group_header := in_f.read(_EXPORT_GROUP_HEADER.size):
+            num_samples, names_size = _EXPORT_GROUP_HEADER.unpack(group_header)
+            name_offsets = array("I")
+            name_offsets.fromfile(in_f, num_samples + 1)
+            names_bytes = in_f.read(names_size)
+            names.extend(names_bytes[name_offsets[i]:name_offsets[i + 1]].decode("utf-8")
+                         for i in range(num_samples))
+
+            # read the wanted columns and seek past the rest
+            for target in all_strs:
+                if target in columns:
+                    columns[target].fromfile(in_f, num_samples)
+                else:
+                    in_f.seek(num_samples * 4, os.SEEK_CUR)
+    return names, columns
+
+
+def read_exported_profiles(export_filename: str) -> Iterator[tuple[str, dict[str, int]]]:
+    """
+    This function reads the counts written by ProfileExporter back as one mystery profile per sample, ready to be
+    matched again with match_profile without rescanning any sequence.
+
+    Parameters: export_filename (str) - A file written by ProfileExporter.
+
+    Returns: (Iterator) Each sample's name and STR counts.
+    """
+    names, columns = read_exported_columns(export_filename)
+    for i, name in enumerate(names):
+        yield name, {target: column[i] for target, column in columns.items()}
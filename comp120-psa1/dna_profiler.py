@@ -9,14 +9,195 @@ Authors:
     2) Sawyer Dentz - sdentz@sandiego.edu
 """
 
-from typing import Tuple, List, Dict
-from sys import argv
+from __future__ import annotations
+
+import time
+
+# taken before anything else is imported, so the rest of this module's import is timed on its own
+_interpreter_seconds = time.process_time() # CPU time the interpreter spent starting up before this module ran
+_import_start_time = time.perf_counter()
+
+from collections.abc import Iterable, Iterator, Callable
+from sys import argv, modules, stderr, stdin
+import mmap
+import os
+import struct
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import product
+import heapq
+import zlib
+from contextlib import contextmanager
+from functools import wraps
+import importlib
+import importlib.util
+import math
+
+# the typing helpers are only needed by type checkers, and importing typing at run time is slow
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Tuple, List, Dict, Any
+    from dna_export import ProfileExporter
+
+
+class _LazyModule:
+    """
+    Stands in for a module until one of its attributes is first used, and only then imports it. The heavier
+    modules are loaded this way so a run only pays to import the ones it actually uses.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Creates the stand-in.
+
+        Parameters: name (str) - The module's full name.
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        """ Imports the module, if it is not yet imported, and returns one of its attributes. """
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+gzip = _LazyModule("gzip")
+hashlib = _LazyModule("hashlib")
+pickle = _LazyModule("pickle")
+json = _LazyModule("json")
+futures = _LazyModule("concurrent.futures")
+
+# NumPy is optional; without it, find_max_consecutive_numpy falls back to find_max_consecutive
+np = _LazyModule("numpy") if importlib.util.find_spec("numpy") is not None else None
 
 # Write your new functions below this point.
 # Recall that all functions need type hints for all parameters and the return,
 # AND must have docstrings in the correct format.
 
 
+class ProfilerStats:
+    """
+    Timings and counters gathered while collect_stats() is active: the calls, wall time and characters (or bytes)
+    processed by each phase, and the calls and characters examined for each STR.
+    """
+
+    phases: dict[str, dict[str, float]]  # phase -> {"calls", "seconds", "characters"}
+    strs: dict[str, dict[str, int]]  # STR -> {"calls", "characters"}
+
+    def __init__(self) -> None:
+        """ Creates empty stats. """
+        self.phases = {}
+        self.strs = {}
+
+    def record(self, phase: str, seconds: float, characters: int) -> None:
+        """
+        Records one call of a phase.
+
+        Parameters: phase (str) - The name of the phase.
+        seconds (float) - The wall time the call took.
+        characters (int) - The characters or bytes the call processed.
+        """
+        totals = self.phases.setdefault(phase, {"calls": 0, "seconds": 0.0, "characters": 0})
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["characters"] += characters
+
+    def record_str(self, target: str, characters: int) -> None:
+        """
+        Records one search for an STR.
+
+        Parameters: target (str) - The STR searched for.
+        characters (int) - The characters of sequence examined.
+        """
+        totals = self.strs.setdefault(target, {"calls": 0, "characters": 0})
+        totals["calls"] += 1
+        totals["characters"] += characters
+
+    def to_json(self) -> str:
+        """
+        Returns the stats as a JSON object with "phases" and "strs" keys, for a metrics pipeline.
+
+        Returns: (str) The stats as JSON.
+        """
+        return json.dumps({"phases": self.phases, "strs": self.strs})
+
+
+_stats: ProfilerStats | None = None # the stats being collected, or None when collection is off
+
+
+@contextmanager
+def collect_stats() -> Iterator[ProfilerStats]:
+    """
+    Collects timings and counters for the profiler's phases while the with block runs. Collection is off
+    otherwise, and then costs next to nothing.
+
+    Returns: (Iterator) The ProfilerStats being filled in.
+
+    >>> with collect_stats() as stats:
+    ...     identify_dna(read_dna_sequence("alice.txt"), create_dna_profiles("dna_database.csv"))
+    'Alice'
+    >>> sorted(stats.phases)
+    ['create_dna_profiles', 'find_all_max_consecutive', 'read_dna_sequence']
+    >>> stats.phases["read_dna_sequence"]["characters"], stats.strs["AGAT"]
+    (122, {'calls': 1, 'characters': 122})
+    """
+    global _stats
+    previous, _stats = _stats, ProfilerStats()
+    try:
+        yield _stats
+    finally:
+        _stats = previous
+
+
+@contextmanager
+def record_phase(phase: str, characters: int = 0) -> Iterator[None]:
+    """
+    Times the with block as one call of a phase, if stats are being collected.
+
+    Parameters: phase (str) - The name of the phase.
+    characters (int) - The characters or bytes the phase processes.
+    """
+    if _stats is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _stats is not None:
+            _stats.record(phase, time.perf_counter() - start_time, characters)
+
+
+def instrumented(characters: Callable[..., int]) -> Callable[[Callable], Callable]:
+    """
+    Decorates a function so each call is recorded as a phase named after it, if stats are being collected.
+
+    Parameters: characters (Callable) - Given the result and the call's arguments, returns the characters or
+    bytes the call processed.
+
+    Returns: (Callable) The decorator.
+    """
+    def decorate(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _stats is None:
+                return function(*args, **kwargs)
+            start_time = time.perf_counter()
+            result = function(*args, **kwargs)
+            _stats.record(function.__name__, time.perf_counter() - start_time, characters(result, *args, **kwargs))
+            return result
+        return wrapper
+    return decorate
+
+
+def _file_size(result: Any, filename: str, *args: Any) -> int:
+    """ Returns the size of the file a phase read, as its characters processed. """
+    return os.path.getsize(filename)
+
+
+@instrumented(lambda result, *args: len(result))
 def read_dna_sequence(sequence_filename: str) -> str:
     """
     Reads into a file and returns a string of DNA sequence.
@@ -43,6 +224,99 @@ def read_dna_sequence(sequence_filename: str) -> str:
         return in_f.readline().strip()
     
 
+def read_dna_chunks(sequence_filename: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    """
+    Memory-maps a file and yields its DNA sequence (the first line, like read_dna_sequence) as bytes chunks of at
+    most chunk_size bases, so the whole sequence never has to be held in memory at once.
+
+    Parameters: sequence_filename (str) - Name of file containing DNA sequence
+    chunk_size (int) - The largest number of bases to yield at a time.
+
+    Returns: (Iterator) An iterator over bytes chunks of the DNA sequence.
+
+    >>> list(read_dna_chunks("bob.txt", 40))
+    [b'AACCCTGCGCGCGCGCGATCTATCTATCTATCTATCCAGC', b'ATTAGCTAGCATCAAGATAGATAGATGAATTTCGAAATGA', b'ATGAATGAATGAATGAATGAATG']
+    """
+    with open(sequence_filename, "rb") as in_f:
+
+        # an empty file cannot be memory-mapped, and has no sequence anyway
+        in_f.seek(0, 2)
+        if in_f.tell() == 0:
+            return
+
+        with mmap.mmap(in_f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+
+            # the sequence ends at the first newline, or at the end of the file
+            end = mapped.find(b"\n")
+            if end == -1:
+                end = len(mapped)
+
+            # leave out surrounding whitespace, as read_dna_sequence does with strip()
+            start = 0
+            while start < end and mapped[start:start + 1].isspace():
+                start += 1
+            while end > start and mapped[end - 1:end].isspace():
+                end -= 1
+
+            for position in range(start, end, chunk_size):
+                yield mapped[position:min(position + chunk_size, end)]
+
+
+@contextmanager
+def _open_profile_rows(profiles_filename: str) -> Iterator[tuple[list[str], Iterator[tuple[str, tuple[int, ...]]]]]:
+    """
+    Opens a dna profiles CSV for reading one row at a time. Every loader reads the CSV through this, so they all
+    check it the same way. Blank lines are skipped.
+
+    Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+
+    Returns: (Iterator) Used in a with statement: the STRs, in header order, and an iterator over each person's
+    name and STR counts (in the same order).
+
+    Raises: ValueError - If the header repeats an STR, or (while iterating) a row does not have one count per STR.
+
+    >>> with _open_profile_rows("dna_database.csv") as (strs, rows):
+    ...     strs, next(rows)
+    (['AGAT', 'AATG', 'TATC'], ('Alice', (5, 2, 8)))
+    """
+    with open(profiles_filename, "r") as in_f:
+        strs = in_f.readline().strip().split(",")[1:]
+        if len(set(strs)) != len(strs):
+            raise ValueError(f"{profiles_filename}: the header repeats an STR")
+
+        def rows() -> Iterator[tuple[str, tuple[int, ...]]]:
+            """ Yields each person's name and counts, checking every row has one count per STR. """
+            for line_number, line in enumerate(in_f, 2):
+                split_line = line.strip().split(",")
+                if len(split_line) != len(strs) + 1:
+                    if not line.strip():
+                        continue
+                    raise ValueError(f"{profiles_filename}, line {line_number}: expected {len(strs) + 1} "
+                                     f"fields, found {len(split_line)}")
+                yield split_line[0], tuple(int(count) for count in split_line[1:])
+
+        yield strs, rows()
+
+
+def _dict_profile_rows(dna_profiles: dict[str, dict[str, int]]) -> Iterator[tuple[str, tuple[int, ...]]]:
+    """
+    Turns the dictionary returned by create_dna_profiles back into rows, in the order people appear in it.
+
+    Parameters: dna_profiles (dict) - The dictionary containing the STR sequence length of each person.
+
+    Returns: (Iterator) Each person's name and STR counts, in the dictionary's STR order.
+
+    >>> next(_dict_profile_rows(create_dna_profiles("dna_database.csv")))
+    ('Alice', (5, 2, 8))
+    """
+    names = {} # used as an ordered set of every name in the profiles
+    for reps in dna_profiles.values():
+        names.update(dict.fromkeys(reps))
+    for name in names:
+        yield name, tuple(reps[name] for reps in dna_profiles.values())
+
+
+@instrumented(_file_size)
 def create_dna_profiles(profiles_filename: str) -> dict[str, dict[str, int]]:
     """
     This function creates multiple dna profiles.
@@ -58,27 +332,102 @@ def create_dna_profiles(profiles_filename: str) -> dict[str, dict[str, int]]:
     profile = {} # dna profile to be created
 
     # open file containing profile data
-    with open(profiles_filename, "r") as in_f:
+    with _open_profile_rows(profiles_filename) as (strs, rows):
 
-        # read header and save STRs as a list and add a subdictionary for each STR
-        strs = in_f.readline().strip().split(",")[1:]
+        # add a subdictionary for each STR in the header
         for i in strs:
             profile[i] = {}
-        
-        # loop through remaining line in file and add name and length of sequence to subdictionary
-        for line in in_f:
-            split_line = line.strip().split(",")
+
+        # loop through the people in the file and add name and length of sequence to subdictionary
+        for name, counts in rows:
             for i in range(len(strs)):
-                profile[strs[i]][split_line[0]] = int(split_line[i + 1])
+                profile[strs[i]][name] = counts[i]
     # return completed dna profile
     return profile
 
 
-def find_max_consecutive(dna: str, target: str) -> int:
+# every group of four bases and the byte it packs into (2 bits per base, first base lowest), and the reverse
+_PACKED_BYTES = {bases: sum("ACGT".index(base) << (2 * i) for i, base in enumerate(bases))
+                 for bases in map("".join, product("ACGT", repeat=4))}
+_UNPACKED_BASES = sorted(_PACKED_BYTES, key=_PACKED_BYTES.__getitem__)
+
+
+class PackedDNA:
+    """
+    A DNA sequence packed four bases to a byte (2 bits per base), a quarter of the memory of a str. Only the bases
+    A, C, G and T can be packed. The STR functions accept a PackedDNA wherever they accept a str, and unpack it a
+    window at a time rather than all at once.
+    """
+
+    length: int  # number of bases in the sequence
+    data: bytearray  # the packed bases, base i in bits 2 * (i % 4) of byte i // 4
+
+    def __init__(self, dna: str) -> None:
+        """
+        Packs a DNA sequence.
+
+        Parameters: dna (str) - The DNA sequence to pack.
+
+        Raises: ValueError - If the sequence holds anything other than A, C, G and T.
+
+        >>> packed = PackedDNA(read_dna_sequence("alice.txt"))
+        >>> len(packed), len(packed.data)
+        (122, 31)
+        """
+        self.length = len(dna)
+
+        # pad the last group of four with A's, which the length then hides
+        padded = dna + "A" * (-len(dna) % 4)
+        try:
+            self.data = bytearray(_PACKED_BYTES[padded[i:i + 4]] for i in range(0, len(padded), 4))
+        except KeyError:
+            raise ValueError("PackedDNA can only hold the bases A, C, G and T") from None
+
+    def __len__(self) -> int:
+        """ Returns the number of bases in the sequence. """
+        return self.length
+
+    def unpack(self, start: int = 0, end: int | None = None) -> str:
+        """
+        Unpacks part of the sequence back into a str.
+
+        Parameters: start (int) - Position of the first base to unpack.
+        end (int) - Position just past the last base to unpack, or None for the end of the sequence.
+
+        Returns: (str) The bases from start up to end.
+
+        >>> PackedDNA("GATTACA").unpack(1, 6)
+        'ATTAC'
+        """
+        if end is None or end > self.length:
+            end = self.length
+        if start >= end:
+            return ""
+        first = start // 4
+        bases = "".join(map(_UNPACKED_BASES.__getitem__, self.data[first:(end + 3) // 4]))
+        return bases[start - first * 4:end - first * 4]
+
+    def chunks(self, chunk_size: int = 1 << 20) -> Iterator[str]:
+        """
+        Unpacks the sequence one window at a time.
+
+        Parameters: chunk_size (int) - The number of bases in each window.
+
+        Returns: (Iterator) An iterator over consecutive pieces of the sequence.
+
+        >>> list(PackedDNA("GATTACA").chunks(3))
+        ['GAT', 'TAC', 'A']
+        """
+        for start in range(0, self.length, chunk_size):
+            yield self.unpack(start, start + chunk_size)
+
+
+@instrumented(lambda result, dna, *args: len(dna))
+def find_max_consecutive(dna: str | PackedDNA, target: str) -> int:
     """
     This function finds the maximum number of times the target STR shows up consecutively in the given DNA sequence.
 
-    Parameters: dna (str) - The DNA strand to search for the STRs in.
+    Parameters: dna (str or PackedDNA) - The DNA strand to search for the STRs in.
     target (str) - The STR the function is searching for.
 
     Returns: (int) Returns an integer of the maximum number of times the target STR shows up consecutively.
@@ -91,7 +440,26 @@ def find_max_consecutive(dna: str, target: str) -> int:
 
     >>> find_max_consecutive("AACACATTCACACACGT", "AC")
     3
+
+    >>> find_max_consecutive(PackedDNA("AACACATTCACACACGT"), "AC")
+    3
+
+    >>> with collect_stats() as stats:
+    ...     find_max_consecutive(PackedDNA("AGATAGAT"), "AGAT")
+    2
+    >>> sorted(stats.phases), stats.strs
+    (['find_max_consecutive'], {'AGAT': {'calls': 1, 'characters': 8}})
     """
+    if _stats is not None:
+        _stats.record_str(target, len(dna))
+
+    # scan packed sequences a window at a time instead of unpacking them whole
+    if isinstance(dna, PackedDNA):
+        counter = STRCounter([target])
+        for chunk in dna.chunks():
+            counter.feed(chunk)
+        return counter.snapshot()[target]
+
     max = 0 # maximum consecutive STR sequence
     count = 0 # current length of sequence
     position = 0 # current position in dna sequence
@@ -116,73 +484,2206 @@ def find_max_consecutive(dna: str, target: str) -> int:
     return max
 
 
-def identify_dna(mystery_dna: str, dna_profiles: dict[str, dict[str, int]],) -> str:
+def has_self_overlap(target: str) -> bool:
     """
-    This function finds which person is associated with the given dna sequence.
+    Checks whether the STR can overlap itself (a proper prefix is also a suffix, like "ACA"). Only for these STRs
+    can find_max_consecutive skip over a match, so a run of matches is not just every match spaced len(target) apart.
 
-    Parameters: mystery_dna (str) - The dna sequence to be identified.
-    dna_profiles (dict) - The dictionary containing the STR sequence length of each person.
+    Parameters: target (str) - The STR to check.
 
-    Returns (str): The name of the person associated with the mystery dna sequence.
+    Returns: (bool) True if the STR can overlap itself.
 
-    >>> identify_dna(read_dna_sequence("bob.txt"), create_dna_profiles("dna_database.csv"))
-    'Bob'
-    >>> identify_dna(read_dna_sequence("alice.txt"), create_dna_profiles("dna_database.csv"))
-    'Alice'
-    >>> identify_dna(read_dna_sequence("charlie.txt"), create_dna_profiles("dna_database.csv"))
-    'Charlie'
-    >>> identify_dna(read_dna_sequence("nomatch.txt"), create_dna_profiles("dna_database.csv"))
-    'No match'
+    >>> has_self_overlap("AGAT")
+    False
+    >>> has_self_overlap("ACA")
+    True
     """
-    mystery_profile = {} # dna profile for unkown person
-    names = [] # list of possible names that match the unkown profile
+    return any(target[:size] == target[-size:] for size in range(1, len(target)))
 
-    # loop through STRs in the dna_profiles dictionary
-    for str in dna_profiles:
 
-        # create mystery dna profile
-        mystery_profile[str] = find_max_consecutive(mystery_dna, str)
+def max_consecutive_from_starts(starts: Iterable[int], length: int) -> int:
+    """
+    Finds the longest consecutive run given the sorted start positions of every match of an STR, skipping
+    overlapping matches exactly as find_max_consecutive does.
 
-    # loop through dna_profile and add all names to list
-    for strs in dna_profiles:
-        for name in dna_profiles[strs]:
-            if name not in names:
-                names.append(name)
-    
-    # if STRs associated with a name does not match mystery_profile, remove the name from the list
-    for (strs, reps) in dna_profiles.items():
-        for name in names:
-            if reps[name] != mystery_profile[strs]:
-                names.remove(name)
-    
-    # if there is only 1 possible name, return it, otherwise return "No match"
-    if len(names) == 1:
-        return names[0]
-    else:
-        return "No match"
+    Parameters: starts (Iterable) - The start position of every match, in increasing order.
+    length (int) - The length of the STR.
 
-# keep the following code at the END of your file, as per convention
-def main(sequence_filename: str, profiles_filename: str) -> None:
+    Returns: (int) The maximum number of times the STR shows up consecutively.
+
+    >>> max_consecutive_from_starts([0, 2, 5], 3)
+    1
+    >>> max_consecutive_from_starts([1, 3, 5, 9], 2)
+    3
     """
-    This function executes identify_dna() which calls the other functions and prints out the name of the mystery person.
+    max = 0 # maximum consecutive STR sequence
+    count = 0 # current length of sequence
+    next_start = 0 # position where a match would extend the current run
 
-    Parameters: sequence_filename (str) - filename of the person's DNA sequence
-    profiles_filename (str) - filename of the dna database
+    for start in starts:
+        if start < next_start:
+            continue
+        if start == next_start:
+            count += 1
+        else:
+            count = 1
+        next_start = start + length
+        if count > max:
+            max = count
+    return max
 
-    >>> main("bob.txt", "dna_database.csv")
-    Bob
-    >>> main("alice.txt", "dna_database.csv")
-    Alice
-    >>> main("charlie.txt", "dna_database.csv")
-    Charlie
-    >>> main("nomatch.txt", "dna_database.csv")
-    No match
+
+def find_max_consecutive_numpy(dna: str, target: str) -> int:
     """
-    # Identifies and prints the names of the person corresponding to the DNA sequence given.
-    print(identify_dna(read_dna_sequence(sequence_filename), create_dna_profiles(profiles_filename)))
+    A vectorized version of find_max_consecutive using NumPy, giving the same result. The sequence is compared
+    against the STR one base at a time to build a mask of match positions, and the mask is then split into
+    len(target) phases whose longest runs are found with array operations. If NumPy is not installed this just
+    calls find_max_consecutive.
 
-if __name__ == "__main__":
-    if len(argv) >= 3:
-        main(argv[1],argv[2])
-    else:
-        print("Error: not enough terminal arguments specified.")
+    Parameters: dna (str) - The DNA strand to search for the STRs in.
+    target (str) - The STR the function is searching for.
+
+    Returns: (int) Returns an integer of the maximum number of times the target STR shows up consecutively.
+
+    >>> find_max_consecutive_numpy("AACCCTGCGCGCGCGCGATCTATCTATCTATCTATCCAGCATTAGCTAGCATCAAGATAGATAGATGAATTTCGAAATGAATGAATGAATGAATGAATGAATG", "AATG")
+    7
+
+    >>> find_max_consecutive_numpy("AACACATTCACACACGT", "AC")
+    3
+
+    >>> find_max_consecutive_numpy("ABABAABA", "ABA")
+    1
+    """
+    if np is None:
+        return find_max_consecutive(dna, target)
+
+    sequence = np.frombuffer(dna.encode("ascii"), dtype=np.uint8)
+    length = len(target)
+    positions = len(sequence) - length + 1 # number of places a match could start
+    if positions <= 0:
+        return 0
+
+    # mark every position where the whole STR matches
+    matches = np.ones(positions, dtype=bool)
+    for offset, code in enumerate(target.encode("ascii")):
+        matches &= sequence[offset:offset + positions] == code
+
+    # an STR that can overlap itself may have matches skipped, so follow the matches one at a time
+    if has_self_overlap(target):
+        return max_consecutive_from_starts(np.flatnonzero(matches).tolist(), length)
+
+    # lay the mask out as one row per phase, each row ending in False so runs cannot join across rows
+    rows = -(-positions // length)
+    phases = np.zeros((length, rows + 1), dtype=bool)
+    padded = np.zeros(rows * length, dtype=bool)
+    padded[:positions] = matches
+    phases[:, :rows] = padded.reshape(rows, length).T
+
+    # the longest run of True is the longest distance between a rising and the next falling edge
+    edges = np.diff(phases.ravel().view(np.int8), prepend=np.int8(0))
+    rises = np.flatnonzero(edges == 1)
+    falls = np.flatnonzero(edges == -1)
+    if len(rises) == 0:
+        return 0
+    return int((falls - rises).max())
+
+
+class STRAutomaton:
+    """
+    An Aho-Corasick automaton built over a set of STRs. Walking a DNA sequence through the automaton reports every
+    STR occurrence in one pass, no matter how many STRs there are.
+    """
+
+    strs: list[str]  # the STRs the automaton was built from
+    lengths: list[int]  # length of each STR, in the same order as strs
+    goto: list[dict[str, int]]  # transition table, goto[state][base] -> next state
+    output: list[tuple[int, ...]]  # indices (into strs) of every STR that ends at each state
+
+    def __init__(self, strs: list[str]) -> None:
+        """
+        Builds the automaton's trie, failure links and full transition table.
+
+        Parameters: strs (list) - The STRs to search for.
+
+        >>> automaton = STRAutomaton(["AGAT", "GATA"])
+        >>> automaton.lengths
+        [4, 4]
+        """
+        self.strs = list(strs)
+        self.lengths = [len(target) for target in self.strs]
+        self.goto = [{}]
+        outputs = [[]]
+
+        # build the trie, one state per distinct prefix
+        for index, target in enumerate(self.strs):
+            state = 0
+            for base in target:
+                if base not in self.goto[state]:
+                    self.goto.append({})
+                    outputs.append([])
+                    self.goto[state][base] = len(self.goto) - 1
+                state = self.goto[state][base]
+            outputs[state].append(index)
+
+        # breadth first pass to fill in failure links, turning the trie into a full transition table
+        alphabet = {base for target in self.strs for base in target}
+        fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for base in alphabet:
+            self.goto[0].setdefault(base, 0)
+        for state in queue:
+            for base in alphabet:
+                child = self.goto[state].get(base)
+                if child is None:
+                    self.goto[state][base] = self.goto[fail[state]][base]
+                else:
+                    fail[child] = self.goto[fail[state]][base]
+                    outputs[child].extend(outputs[fail[child]])
+                    queue.append(child)
+        self.output = [tuple(out) for out in outputs]
+
+    def scan(self, dna: str, state: int, offset: int, next_start: list[int], counts: list[int],
+             maximums: list[int]) -> int:
+        """
+        Feeds a piece of DNA through the automaton, updating the run bookkeeping of every STR in place. The
+        bookkeeping follows find_max_consecutive exactly: a match that overlaps the end of the previous match is
+        skipped, a match right where the previous one ended extends the run, and any other match starts a new run.
+
+        Parameters: dna (str) - The piece of DNA to scan.
+        state (int) - The automaton state left by the previous piece (0 at the start of a sequence).
+        offset (int) - The position of dna's first base within the whole sequence.
+        next_start (list) - For each STR, the position where a match would extend the current run.
+        counts (list) - For each STR, the length of the current run.
+        maximums (list) - For each STR, the longest run found so far.
+
+        Returns: (int) The automaton state after the last base, to be passed in with the next piece.
+        """
+        goto = self.goto
+        output = self.output
+        lengths = self.lengths
+
+        for position, base in enumerate(dna, offset):
+            state = goto[state].get(base, 0)
+            for index in output[state]:
+                start = position - lengths[index] + 1
+
+                # skip matches that overlap the previous match, as find_max_consecutive would
+                if start < next_start[index]:
+                    continue
+                if start == next_start[index]:
+                    counts[index] += 1
+                else:
+                    counts[index] = 1
+                next_start[index] = start + lengths[index]
+                if counts[index] > maximums[index]:
+                    maximums[index] = counts[index]
+        return state
+
+
+@instrumented(lambda result, dna, *args: len(dna))
+def find_all_max_consecutive(dna: str | PackedDNA, targets: list[str]) -> dict[str, int]:
+    """
+    This function finds the maximum number of times each target STR shows up consecutively in the given DNA
+    sequence, scanning the sequence only once. The result is the same as calling find_max_consecutive for every
+    target.
+
+    Parameters: dna (str or PackedDNA) - The DNA strand to search for the STRs in.
+    targets (list) - The STRs the function is searching for.
+
+    Returns: (dict) A dictionary with each STR as the key and its maximum consecutive count as the value.
+
+    >>> find_all_max_consecutive(read_dna_sequence("alice.txt"), ["AGAT", "AATG", "TATC"])
+    {'AGAT': 5, 'AATG': 2, 'TATC': 8}
+
+    >>> find_all_max_consecutive("AACACATTCACACACGT", ["AC", "CA", "ACA"])
+    {'AC': 3, 'CA': 3, 'ACA': 1}
+
+    >>> find_all_max_consecutive("ABABAABA", ["ABA"])
+    {'ABA': 1}
+    """
+    counter = STRCounter(targets)
+
+    # scan packed sequences a window at a time instead of unpacking them whole
+    for chunk in dna.chunks() if isinstance(dna, PackedDNA) else [dna]:
+        counter.feed(chunk)
+    if _stats is not None:
+        for target in targets:
+            _stats.record_str(target, len(dna))
+    return counter.snapshot()
+
+
+# each base's complement on the opposite strand
+_COMPLEMENTS = str.maketrans("ACGTacgt", "TGCAtgca")
+
+
+def reverse_complement(dna: str) -> str:
+    """
+    Returns the sequence of the opposite strand: the bases reversed, with A and T swapped and C and G swapped.
+
+    Parameters: dna (str) - The DNA strand.
+
+    Returns: (str) The reverse complement.
+
+    >>> reverse_complement("AGATC")
+    'GATCT'
+    """
+    return dna.translate(_COMPLEMENTS)[::-1]
+
+
+def _match_starts(dna: str | PackedDNA, target: str) -> list[int]:
+    """
+    Finds the start of every match of an STR, overlapping matches included.
+
+    Parameters: dna (str or PackedDNA) - The DNA strand to search for the STR in.
+    target (str) - The STR to search for.
+
+    Returns: (list) The start position of every match, in increasing order.
+    """
+    starts = []
+    offset = 0 # position in dna of the start of the current window
+    carry = "" # the end of the previous window, so matches crossing into this one are found
+    for chunk in dna.chunks() if isinstance(dna, PackedDNA) else [dna]:
+        window = carry + chunk
+        position = window.find(target)
+        while position != -1:
+            starts.append(offset - len(carry) + position)
+            position = window.find(target, position + 1)
+        offset += len(chunk)
+        carry = window[len(window) - len(target) + 1:] if len(target) > 1 else ""
+    return starts
+
+
+def find_strand_max_consecutive(dna: str | PackedDNA, targets: list[str]) -> dict[str, dict[str, int]]:
+    """
+    This function counts each target STR on both strands in a single pass over the sequence. A run of an STR on
+    the reverse strand reads as a run of the STR's reverse complement on the forward strand, so both motifs are
+    counted by the same automaton and the reverse complement never has to be built. The exception is an STR that
+    can overlap itself: find_max_consecutive skips overlapping matches from the start of the reverse strand,
+    which is the end of the forward strand, so those matches are collected and replayed from the other end.
+
+    Parameters: dna (str or PackedDNA) - The DNA strand to search for the STRs in.
+    targets (list) - The STRs the function is searching for.
+
+    Returns: (dict) The maximum consecutive count of each STR on the "forward" strand, the "reverse" strand, and
+    the larger of the two ("combined").
+
+    >>> counts = find_strand_max_consecutive(reverse_complement(read_dna_sequence("bob.txt")), ["AGAT", "AATG"])
+    >>> counts["forward"], counts["reverse"], counts["combined"]
+    ({'AGAT': 4, 'AATG': 1}, {'AGAT': 3, 'AATG': 7}, {'AGAT': 4, 'AATG': 7})
+
+    >>> find_strand_max_consecutive("TATATTAT", ["ATA"])["reverse"], find_max_consecutive("ATAATATA", "ATA")
+    ({'ATA': 2}, 2)
+    """
+    reverse_targets = {target: reverse_complement(target) for target in targets}
+    scanned = [reverse_target for reverse_target in reverse_targets.values() if not has_self_overlap(reverse_target)]
+    counts = find_all_max_consecutive(dna, targets + scanned)
+
+    forward = {target: counts[target] for target in targets}
+    reverse = {}
+    for target, reverse_target in reverse_targets.items():
+        if has_self_overlap(reverse_target):
+
+            # match p on the forward strand starts at len(dna) - p - len(target) on the reverse strand
+            starts = _match_starts(dna, reverse_target)
+            reverse[target] = max_consecutive_from_starts(
+                (len(dna) - start - len(target) for start in reversed(starts)), len(target))
+        else:
+            reverse[target] = counts[reverse_target]
+    combined = {target: max(forward[target], reverse[target]) for target in targets}
+    return {"forward": forward, "reverse": reverse, "combined": combined}
+
+
+class STRCounter:
+    """
+    An online version of find_all_max_consecutive: the sequence is fed in pieces of any size as it arrives, and the
+    longest run of each STR so far can be read at any time. The automaton state and each STR's current run are
+    carried from one piece to the next, so the final snapshot is the same as scanning the whole sequence at once.
+    """
+
+    targets: list[str]  # the STRs being counted
+    position: int  # number of bases fed so far
+    _automaton: STRAutomaton  # automaton over the STRs
+    _state: int  # automaton state after the last base fed
+    _next_start: list[int]  # for each STR, the position where a match would extend the current run
+    _counts: list[int]  # for each STR, the length of the current run
+    _maximums: list[int]  # for each STR, the longest run so far
+
+    def __init__(self, targets: list[str]) -> None:
+        """
+        Creates a counter that has seen no bases yet.
+
+        Parameters: targets (list) - The STRs to count.
+        """
+        self.targets = list(targets)
+        self.position = 0
+        self._automaton = STRAutomaton(self.targets)
+        self._state = 0
+        self._next_start = [0] * len(self.targets)
+        self._counts = [0] * len(self.targets)
+        self._maximums = [0] * len(self.targets)
+
+    def feed(self, chunk: bytes | str) -> None:
+        """
+        Scans the next piece of the sequence.
+
+        Parameters: chunk (bytes or str) - The bases following the ones fed so far.
+        """
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("ascii")
+        self._state = self._automaton.scan(chunk, self._state, self.position, self._next_start, self._counts,
+                                           self._maximums)
+        self.position += len(chunk)
+
+    def snapshot(self) -> dict[str, int]:
+        """
+        Returns the longest run of each STR in the bases fed so far.
+
+        Returns: (dict) A dictionary with each STR as the key and its maximum consecutive count as the value.
+
+        >>> counter = STRCounter(["AGAT", "AATG"])
+        >>> counter.feed("CCAGATAG")
+        >>> counter.snapshot()
+        {'AGAT': 1, 'AATG': 0}
+        >>> counter.feed(b"ATAGATAATG")
+        >>> counter.snapshot(), counter.position
+        ({'AGAT': 3, 'AATG': 1}, 18)
+        """
+        return dict(zip(self.targets, self._maximums))
+
+
+def find_max_consecutive_in_chunks(chunks: Iterable[bytes | str], targets: list[str]) -> dict[str, int]:
+    """
+    This function finds the maximum number of times each target STR shows up consecutively in a DNA sequence that
+    arrives in chunks, such as from read_dna_chunks. Runs that cross from one chunk into the next are carried over,
+    so the result is the same as find_all_max_consecutive on the joined sequence.
+
+    Parameters: chunks (Iterable) - The DNA sequence, as consecutive bytes or str chunks.
+    targets (list) - The STRs the function is searching for.
+
+    Returns: (dict) A dictionary with each STR as the key and its maximum consecutive count as the value.
+
+    >>> find_max_consecutive_in_chunks(read_dna_chunks("alice.txt", 5), ["AGAT", "AATG", "TATC"])
+    {'AGAT': 5, 'AATG': 2, 'TATC': 8}
+
+    >>> find_max_consecutive_in_chunks([b"ACA", b"CAC", b"ACG"], ["AC"])
+    {'AC': 4}
+    """
+    counter = STRCounter(targets)
+    start_time = time.perf_counter()
+    scan_seconds = 0.0 # time spent scanning, as opposed to waiting for chunks
+
+    for chunk in chunks:
+        scan_start = time.perf_counter()
+        counter.feed(chunk)
+        scan_seconds += time.perf_counter() - scan_start
+
+    # split the time between reading the chunks and scanning them
+    if _stats is not None:
+        _stats.record("read_dna_chunks", time.perf_counter() - start_time - scan_seconds, counter.position)
+        _stats.record("find_max_consecutive_in_chunks", scan_seconds, counter.position)
+        for target in targets:
+            _stats.record_str(target, counter.position)
+    return counter.snapshot()
+
+
+def read_fasta_records(fasta_filename: str, chunk_size: int = 1 << 16) -> Iterator[tuple[str, Iterator[bytes]]]:
+    """
+    Streams the records of a FASTA file, which may be plain text or gzip (including bgzip) compressed, without
+    decompressing it to disk or holding a whole record in memory. Each record's wrapped lines are joined into
+    bytes chunks of about chunk_size bases. A file with no ">" header lines is read as a single record named "".
+    Soft-masked (lowercase) bases, which is how repeats are often marked, are converted to uppercase.
+
+    Each record's chunks must be used before moving on to the next record; any left over are skipped.
+
+    Parameters: fasta_filename (str) - Name of the FASTA file.
+    chunk_size (int) - The rough number of bases in each chunk.
+
+    Returns: (Iterator) Each record's header (without the ">") and an iterator over its sequence in chunks.
+
+    >>> import os, tempfile
+    >>> fasta_filename = os.path.join(tempfile.mkdtemp(), "samples.fa.gz")
+    >>> with gzip.open(fasta_filename, "wt") as out_f:
+    ...     _ = out_f.write(">sample1 chr1\\nAGATAG\\nATAGAT\\n>sample2\\nAATGAATG\\n")
+    >>> [(name, b"".join(chunks)) for name, chunks in read_fasta_records(fasta_filename)]
+    [('sample1 chr1', b'AGATAGATAGAT'), ('sample2', b'AATGAATG')]
+    >>> with open(fasta_filename, "wb") as out_f:
+    ...     _ = out_f.write(b">masked\\nagatagat\\nAGAT\\n")
+    >>> list(count_fasta_records(fasta_filename, ["AGAT"]))
+    [('masked', {'AGAT': 3})]
+    >>> with open(fasta_filename, "wb") as out_f:
+    ...     _ = out_f.write(b"\\n\\n>first\\nAGAT\\n")
+    >>> [(name, b"".join(chunks)) for name, chunks in read_fasta_records(fasta_filename)]
+    [('first', b'AGAT')]
+    """
+    with open(fasta_filename, "rb") as in_f:
+        is_gzip = in_f.read(2) == b"\x1f\x8b"
+
+    with (gzip.open if is_gzip else open)(fasta_filename, "rb") as in_f:
+        lines = iter(in_f)
+        # skip blank lines before the first header, so they do not make an empty record of their own
+        header = next((line for line in lines if line.strip()), None) # the next record's header line, or None
+        first_line = None # a sequence line read while looking for the first header
+
+        if header is not None and not header.startswith(b">"):
+            header, first_line = b">", header
+
+        def record_chunks() -> Iterator[bytes]:
+            """ Yields the current record's sequence, stopping at the next header line. """
+            nonlocal header, first_line
+            buffer = [] # lines waiting to be joined into a chunk
+            size = 0 # number of bases in buffer
+            header = None
+            if first_line is not None:
+                buffer, size, first_line = [first_line.strip().upper()], len(first_line.strip()), None
+
+            for line in lines:
+                if line.startswith(b">"):
+                    header = line
+                    break
+                line = line.strip().upper()
+                buffer.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    yield b"".join(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield b"".join(buffer)
+
+        while header is not None:
+            chunks = record_chunks()
+            yield header[1:].decode("utf-8").strip(), chunks
+
+            # skip whatever the caller did not read, to reach the next header
+            for chunk in chunks:
+                pass
+
+
+def count_fasta_records(fasta_filename: str, targets: list[str]) -> Iterator[tuple[str, dict[str, int]]]:
+    """
+    This function finds the maximum consecutive count of each target STR in every record of a FASTA file, one
+    record at a time.
+
+    Parameters: fasta_filename (str) - Name of the FASTA file, plain or gzip compressed.
+    targets (list) - The STRs the function is searching for.
+
+    Returns: (Iterator) Each record's header and its STR counts.
+    """
+    for name, chunks in read_fasta_records(fasta_filename):
+        yield name, find_max_consecutive_in_chunks(chunks, targets)
+
+
+def find_runs(dna: str, target: str, position: int, end: int) -> Iterator[tuple[int, int]]:
+    """
+    Follows find_max_consecutive's path through the DNA from the given position, yielding each run of the target
+    STR it finds. The searching is done with str.find, so stretches without a match are skipped at C speed.
+
+    Parameters: dna (str) - The DNA strand to search for the STR in.
+    target (str) - The STR the function is searching for.
+    position (int) - Where to start following the path.
+    end (int) - Only matches starting before this position are counted.
+
+    Returns: (Iterator) The start position and the number of consecutive matches of each run.
+
+    >>> list(find_runs("AACACATTCACACACGT", "AC", 0, 17))
+    [(1, 2), (9, 3)]
+    >>> list(find_runs("AACACATTCACACACGT", "AC", 0, 12))
+    [(1, 2), (9, 2)]
+    """
+    length = len(target)
+    while True:
+        position = dna.find(target, position, end + length - 1)
+        if position == -1:
+            return
+        start = position
+        while position < end and dna.startswith(target, position):
+            position += length
+        yield start, (position - start) // length
+
+
+def _summarize_chunk(chunk: str, strs: list[str], end: int) -> list[list[tuple[int, int, int, int, int, bool] | None]]:
+    """
+    Scans one chunk of a sequence for parallel_find_max_consecutive. This runs in a worker process.
+
+    How a chunk is scanned depends on where the previous chunk left off: a run crossing into the chunk makes
+    find_max_consecutive's path start up to len(target) - 1 bases in. So for every STR and every such entry point
+    the chunk reports a summary: the start and count of its leading run, the best count among the rest of its runs,
+    and where its trailing run would continue and its count (and whether the leading run is also the trailing run).
+    Paths from different entry points nearly always join after a match or two, so only the first path is followed
+    all the way through the chunk.
+
+    Parameters: chunk (str) - The chunk, plus enough of the next chunk for the last matches to fit.
+    strs (list) - The STRs to count.
+    end (int) - The length of the chunk itself; only matches starting before it belong to this chunk.
+
+    Returns: (list) For each STR, a summary (or None if the path finds no runs) for each entry point.
+    """
+    summaries = []
+
+    for target in strs:
+        length = len(target)
+        runs = list(find_runs(chunk, target, 0, end))
+        starts = [start for start, count in runs]
+
+        # best count among the runs from each index onwards
+        best_from = [0] * (len(runs) + 1)
+        for index in range(len(runs) - 1, -1, -1):
+            best_from[index] = max(runs[index][1], best_from[index + 1])
+
+        entries = []
+        for entry in range(min(length, end)):
+
+            if entry == 0:
+                path, joined = runs[:1], 1
+            else:
+
+                # follow the path from this entry until it lands on the path from the start of the chunk
+                path = [] # runs found before the paths join
+                joined = len(runs) # index of the first run of the shared path after the join
+                for start, count in find_runs(chunk, target, entry, end):
+                    index = bisect_right(starts, start) - 1
+                    path.append((start, count))
+                    if index >= 0 and (start - starts[index]) % length == 0 and \
+                            start < starts[index] + runs[index][1] * length:
+                        joined = index + 1
+                        break
+
+            if not path:
+                entries.append(None)
+                continue
+            if joined < len(runs):
+                last_start, last_count = runs[-1]
+            else:
+                last_start, last_count = path[-1]
+            rest_best = max([count for start, count in path[1:]] + [best_from[joined]])
+            entries.append((path[0][0], path[0][1], rest_best, last_start + last_count * length, last_count,
+                            len(path) == 1 and joined == len(runs)))
+        summaries.append(entries)
+    return summaries
+
+
+def parallel_find_max_consecutive(dna: str, targets: list[str], workers: int | None = None,
+                                  chunk_size: int | None = None) -> dict[str, int]:
+    """
+    This function finds the maximum number of times each target STR shows up consecutively in the given DNA
+    sequence, splitting the sequence into chunks that are scanned in worker processes. Runs that cross chunk
+    boundaries are stitched back together, so the result is exactly the same as find_max_consecutive.
+
+    Parameters: dna (str) - The DNA strand to search for the STRs in.
+    targets (list) - The STRs the function is searching for.
+    workers (int) - The number of worker processes, or None for one per CPU.
+    chunk_size (int) - The number of bases in each chunk, or None to give each worker a few chunks.
+
+    Returns: (dict) A dictionary with each STR as the key and its maximum consecutive count as the value.
+
+    >>> parallel_find_max_consecutive(read_dna_sequence("charlie.txt"), ["AGAT", "AATG", "TATC"], 2, 10)
+    {'AGAT': 6, 'AATG': 1, 'TATC': 5}
+    """
+    longest = max((len(target) for target in targets), default=1)
+    if chunk_size is None:
+        chunk_size = -(-len(dna) // (4 * (workers or os.cpu_count() or 1)))
+
+    # a chunk must be longer than any STR, so a run crossing into it starts within its first len(target) bases
+    chunk_size = max(chunk_size, longest)
+    chunk_starts = range(0, len(dna), chunk_size)
+
+    with futures.ProcessPoolExecutor(workers) as pool:
+        chunk_summaries = pool.map(_summarize_chunk,
+                                   [dna[start:start + chunk_size + longest - 1] for start in chunk_starts],
+                                   [targets] * len(chunk_starts),
+                                   [min(chunk_size, len(dna) - start) for start in chunk_starts])
+
+        maximums = [0] * len(targets) # longest run of each STR
+        next_start = [0] * len(targets) # position where a match would extend each current run
+        counts = [0] * len(targets) # length of each current run
+
+        # stitch the chunks together in order, carrying the trailing run of each into the next
+        for chunk_start, summaries in zip(chunk_starts, chunk_summaries):
+            for index, entries in enumerate(summaries):
+                entry = max(next_start[index] - chunk_start, 0)
+                if entry >= len(entries) or entries[entry] is None:
+                    continue
+                first_start, first_count, rest_best, last_next, last_count, last_is_first = entries[entry]
+                if first_start == next_start[index] - chunk_start:
+                    first_count += counts[index]
+                maximums[index] = max(maximums[index], first_count, rest_best)
+                counts[index] = first_count if last_is_first else last_count
+                next_start[index] = chunk_start + last_next
+    return dict(zip(targets, maximums))
+
+
+def _smallest_rotation(motif: str) -> str:
+    """ Returns the alphabetically first rotation of a motif, so every phase of a repeat has the same name. """
+    return min(motif[shift:] + motif[:shift] for shift in range(len(motif)))
+
+
+def _tandem_stretches(dna: str, period: int) -> Iterator[tuple[int, int]]:
+    """
+    Finds every maximal tandem repeat with the given period: a stretch where each base equals the one period
+    bases later, long enough to hold at least two copies.
+
+    Parameters: dna (str) - The DNA strand to search.
+    period (int) - The motif length.
+
+    Returns: (Iterator) The start and number of full copies of each repeat.
+    """
+    if np is not None:
+        sequence = np.frombuffer(dna.encode("ascii"), dtype=np.uint8)
+        same = np.zeros(max(len(sequence) - period, 0) + 2, dtype=np.int8)
+        same[1:-1] = sequence[:-period] == sequence[period:]
+        edges = np.diff(same)
+        starts = np.flatnonzero(edges == 1)
+        lengths = np.flatnonzero(edges == -1) - starts
+        keep = lengths >= period
+        yield from zip(starts[keep].tolist(), ((lengths[keep] + period) // period).tolist())
+        return
+
+    start = 0 # start of the current stretch of bases matching the one period later
+    for position in range(len(dna) - period + 1):
+        if position == len(dna) - period or dna[position] != dna[position + period]:
+            if position - start >= period:
+                yield start, (position - start + period) // period
+            start = position + 1
+
+
+def discover_tandem_repeats(dna: str, top_k: int = 10, min_length: int = 2,
+                            max_length: int = 6) -> list[tuple[str, int, int]]:
+    """
+    This function finds which short motifs form the longest tandem runs in a DNA sequence, without being told the
+    motifs in advance. For each motif length, one linear pass finds every stretch where each base equals the one
+    a motif length later; such a stretch is a tandem repeat. Repeats are then taken longest first, skipping motifs
+    that are themselves repeats of a shorter motif, and keeping each motif's longest run. Different phases of the
+    same repeat (like AGAT and GATA) count as one motif.
+
+    Parameters: dna (str) - The DNA strand to search.
+    top_k (int) - The number of motifs to return.
+    min_length (int) - The shortest motif to look for.
+    max_length (int) - The longest motif to look for.
+
+    Returns: (list) Up to top_k (motif, copies, position) tuples, most copies first. Each motif is given in the
+    phase its run starts with, so find_max_consecutive counts the same number of copies (unless the motif can
+    overlap itself and an earlier match hides the start of the run).
+
+    >>> discover_tandem_repeats(read_dna_sequence("alice.txt"), 3)
+    [('CTAT', 8, 16), ('AGAT', 5, 65), ('ACGT', 3, 49)]
+    """
+    repeats = [] # (copies, period, start) of every repeat found
+    for period in range(min_length, max_length + 1):
+        repeats.extend((copies, period, start) for start, copies in _tandem_stretches(dna, period))
+    repeats.sort(key=lambda repeat: (-repeat[0], repeat[2], repeat[1]))
+
+    found = [] # the longest run of each motif, longest first
+    seen = set() # the motifs already found, by their smallest rotation
+    for copies, period, start in repeats:
+        if len(found) == top_k:
+            break
+        motif = dna[start:start + period]
+
+        # a motif that is a repeat of a shorter one (like ATAT) is already counted under the shorter one
+        if any(period % size == 0 and motif == motif[:size] * (period // size) for size in range(1, period)):
+            continue
+        name = _smallest_rotation(motif)
+        if name not in seen:
+            seen.add(name)
+            found.append((motif, copies, start))
+    return found
+
+
+class ProfileStore(ABC):
+    """
+    Parent class for every way of holding the DNA profiles that identify_dna can search. A store knows its STRs and
+    can find the person matching a mystery profile.
+    """
+
+    strs: list[str]  # the STRs, in the order the store keeps its counts
+
+    @abstractmethod
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """ Returns the name of the one person matching the profile, or "No match". """
+        return "No match"
+
+
+class ProfileIndex(ProfileStore):
+    """
+    A hash index over the DNA profiles, keyed by each person's full tuple of STR counts (in the header's STR order),
+    so finding an exact match is a single dictionary lookup.
+    """
+
+    strs: list[str]  # the STRs, in the order used for the count tuples
+    index: dict[tuple[int, ...], list[str]]  # count tuple -> names of everyone with those counts
+
+    def __init__(self, strs: list[str]) -> None:
+        """
+        Creates an empty index over the given STRs.
+
+        Parameters: strs (list) - The STRs, in the order the count tuples will use.
+        """
+        self.strs = list(strs)
+        self.index = {}
+
+    @classmethod
+    def from_profiles(cls, dna_profiles: dict[str, dict[str, int]]) -> "ProfileIndex":
+        """
+        Builds an index from the dictionary returned by create_dna_profiles.
+
+        Parameters: dna_profiles (dict) - The dictionary containing the STR sequence length of each person.
+
+        Returns: (ProfileIndex) An index over the same profiles.
+
+        >>> ProfileIndex.from_profiles(create_dna_profiles("dna_database.csv")).index[(3, 7, 4)]
+        ['Bob']
+        """
+        profile_index = cls(list(dna_profiles))
+        for name, counts in _dict_profile_rows(dna_profiles):
+            profile_index.add(name, counts)
+        return profile_index
+
+    def add(self, name: str, counts: tuple[int, ...]) -> None:
+        """
+        Adds a person to the index.
+
+        Parameters: name (str) - The person's name.
+        counts (tuple) - The person's STR counts, in the same order as strs.
+        """
+        self.index.setdefault(counts, []).append(name)
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> profile_index = create_profile_index("dna_database.csv")
+        >>> profile_index.identify({'AGAT': 5, 'AATG': 2, 'TATC': 8})
+        'Alice'
+        >>> profile_index.identify({'AGAT': 5, 'AATG': 2, 'TATC': 7})
+        'No match'
+        >>> profile_index.add("Alice's twin", (5, 2, 8))
+        >>> profile_index.identify({'AGAT': 5, 'AATG': 2, 'TATC': 8})
+        'No match'
+        """
+        names = self.index.get(tuple(mystery_profile[strs] for strs in self.strs), [])
+
+        # if there is only 1 possible name, return it, otherwise return "No match"
+        if len(names) == 1:
+            return names[0]
+        else:
+            return "No match"
+
+
+@instrumented(_file_size)
+def create_profile_index(profiles_filename: str) -> ProfileIndex:
+    """
+    This function loads the dna profiles straight into a ProfileIndex, without building the nested dictionary of
+    create_dna_profiles.
+
+    Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+
+    Returns: (ProfileIndex) An index of every person keyed by their STR counts.
+
+    >>> create_profile_index("dna_database.csv").index
+    {(5, 2, 8): ['Alice'], (3, 7, 4): ['Bob'], (6, 1, 5): ['Charlie']}
+    """
+    with _open_profile_rows(profiles_filename) as (strs, rows):
+
+        # index each person by their counts
+        profile_index = ProfileIndex(strs)
+        for name, counts in rows:
+            profile_index.add(name, counts)
+    return profile_index
+
+
+class UpdatableProfileIndex(ProfileIndex):
+    """
+    A ProfileIndex that people can be added to, updated in and removed from while it is in use, keeping the count
+    tuple index current as they change. Every change is appended to a log file. On restart the index is loaded
+    from its last checkpoint (a pickle, much faster than the CSV) and the log is replayed on top.
+    """
+
+    people: dict[str, tuple[int, ...]]  # each person's counts, in the same order as strs
+    log_filename: str | None  # the log that changes are appended to, or None to not log them
+
+    def __init__(self, strs: list[str], log_filename: str | None = None) -> None:
+        """
+        Creates an empty index over the given STRs.
+
+        Parameters: strs (list) - The STRs, in the order the count tuples will use.
+        log_filename (str) - The log to append changes to, or None to not log them.
+        """
+        super().__init__(strs)
+        self.people = {}
+        self.log_filename = log_filename
+
+    @classmethod
+    def open(cls, profiles_filename: str, log_filename: str, checkpoint_filename: str) -> "UpdatableProfileIndex":
+        """
+        Loads the index from its checkpoint if there is one (or else from the profiles CSV), then replays every
+        change in the log.
+
+        Parameters: profiles_filename (str) - The profiles CSV, used only if there is no checkpoint yet.
+        log_filename (str) - The log of changes since the checkpoint.
+        checkpoint_filename (str) - The checkpoint written by checkpoint().
+
+        Returns: (UpdatableProfileIndex) The index, logging further changes to log_filename.
+
+        >>> import os, tempfile
+        >>> workdir = tempfile.mkdtemp()
+        >>> log_filename = os.path.join(workdir, "changes.log")
+        >>> checkpoint_filename = os.path.join(workdir, "profiles.pickle")
+        >>> profiles = UpdatableProfileIndex.open("dna_database.csv", log_filename, checkpoint_filename)
+        >>> profiles.add("Dana", (4, 4, 4))
+        >>> profiles.update("Bob", (3, 7, 5))
+        >>> profiles.remove("Alice")
+        >>> profiles = UpdatableProfileIndex.open("dna_database.csv", log_filename, checkpoint_filename)
+        >>> profiles.identify({'AGAT': 4, 'AATG': 4, 'TATC': 4}), profiles.identify({'AGAT': 3, 'AATG': 7, 'TATC': 5})
+        ('Dana', 'Bob')
+        >>> profiles.identify({'AGAT': 5, 'AATG': 2, 'TATC': 8})
+        'No match'
+        >>> profiles.checkpoint(checkpoint_filename)
+        >>> os.path.getsize(log_filename)
+        0
+        >>> sorted(UpdatableProfileIndex.open("dna_database.csv", log_filename, checkpoint_filename).people)
+        ['Bob', 'Charlie', 'Dana']
+        """
+        profile_index = cls([])
+        if os.path.exists(checkpoint_filename):
+            with open(checkpoint_filename, "rb") as in_f:
+                profile_index.strs, people = pickle.load(in_f)
+        else:
+            with _open_profile_rows(profiles_filename) as (profile_index.strs, rows):
+                people = dict(rows)
+        for name, counts in people.items():
+            profile_index.add(name, counts)
+
+        # replay the changes made since the checkpoint. Replaying is idempotent, in case a crash came between
+        # writing a checkpoint and emptying the log.
+        if os.path.exists(log_filename):
+            with open(log_filename, "r") as in_f:
+                for line in in_f:
+                    operation, name, *counts = line.rstrip("\n").split(",")
+                    if operation == "remove":
+                        if name in profile_index.people:
+                            profile_index.remove(name)
+                    elif name in profile_index.people:
+                        profile_index.update(name, tuple(int(count) for count in counts))
+                    else:
+                        profile_index.add(name, tuple(int(count) for count in counts))
+
+        profile_index.log_filename = log_filename
+        return profile_index
+
+    def _log(self, *fields: object) -> None:
+        """
+        Appends one change to the log, if there is one.
+
+        Parameters: fields (object) - The operation, name and any counts.
+        """
+        if self.log_filename is not None:
+            with open(self.log_filename, "a") as out_f:
+                out_f.write(",".join(map(str, fields)) + "\n")
+
+    def add(self, name: str, counts: tuple[int, ...]) -> None:
+        """
+        Adds a person to the index.
+
+        Parameters: name (str) - The person's name.
+        counts (tuple) - The person's STR counts, in the same order as strs.
+
+        Raises: ValueError - If the person is already in the index, or has the wrong number of counts.
+        """
+        if name in self.people:
+            raise ValueError(f"{name} is already in the profiles")
+        if len(counts) != len(self.strs):
+            raise ValueError(f"expected {len(self.strs)} counts for {name}, got {len(counts)}")
+        self._log("add", name, *counts)
+        self.people[name] = counts
+        super().add(name, counts)
+
+    def remove(self, name: str) -> None:
+        """
+        Removes a person from the index.
+
+        Parameters: name (str) - The person's name.
+
+        Raises: KeyError - If the person is not in the index.
+        """
+        counts = self.people.pop(name)
+        self._log("remove", name)
+        names = self.index[counts]
+        names.remove(name)
+        if not names:
+            del self.index[counts]
+
+    def update(self, name: str, counts: tuple[int, ...]) -> None:
+        """
+        Changes a person's counts.
+
+        Parameters: name (str) - The person's name.
+        counts (tuple) - The person's new STR counts, in the same order as strs.
+
+        Raises: KeyError - If the person is not in the index.
+        """
+        if len(counts) != len(self.strs):
+            raise ValueError(f"expected {len(self.strs)} counts for {name}, got {len(counts)}")
+        log_filename, self.log_filename = self.log_filename, None
+        try:
+            self.remove(name)
+            self.add(name, counts)
+        finally:
+            self.log_filename = log_filename
+        self._log("update", name, *counts)
+
+    def checkpoint(self, checkpoint_filename: str) -> None:
+        """
+        Saves the whole index and empties the log, so the next open() has nothing to replay.
+
+        Parameters: checkpoint_filename (str) - The checkpoint file to write.
+        """
+        # write to a temporary file first so a crash never leaves a half written checkpoint
+        with open(checkpoint_filename + ".tmp", "wb") as out_f:
+            pickle.dump((self.strs, self.people), out_f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(checkpoint_filename + ".tmp", checkpoint_filename)
+        if self.log_filename is not None:
+            open(self.log_filename, "w").close()
+
+
+# compiled profile files start with this header: magic, number of STRs, number of people, and the byte sizes of the
+# name table and STR header. The count matrix, name offsets, names and STRs follow in native byte order.
+_COMPILED_MAGIC = b"DNAPROF1"
+_COMPILED_HEADER = struct.Struct("=8sIIQQ")
+
+
+def compile_dna_profiles(profiles_filename: str, compiled_filename: str, false_positive_rate: float = 0.01) -> None:
+    """
+    This function compiles a dna profiles CSV into a columnar binary file that CompiledProfiles can memory-map,
+    so later runs skip parsing the CSV. The rows are sorted by their STR counts so a match can be found by binary
+    search. A ProfileBloomFilter of the rows is saved next to it (with ".bloom" added to the name), so loading
+    the compiled file with a filter does not have to hash every row again.
+
+    Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+    compiled_filename (str) - The binary file to write.
+    false_positive_rate (float) - The false positive rate of the saved filter.
+    """
+    with _open_profile_rows(profiles_filename) as (strs, people):
+        rows = sorted((counts, name) for name, counts in people)
+
+    names = bytearray() # every name, one after another
+    name_offsets = array("Q", [0]) # where each name starts in names, plus where the last one ends
+    for counts, name in rows:
+        names += name.encode("utf-8")
+        name_offsets.append(len(names))
+    strs_bytes = ",".join(strs).encode("ascii")
+
+    with open(compiled_filename, "wb") as out_f:
+        out_f.write(_COMPILED_HEADER.pack(_COMPILED_MAGIC, len(strs), len(rows), len(names), len(strs_bytes)))
+
+        # write the count matrix a block of rows at a time
+        for block in range(0, len(rows), 1 << 16):
+            array("I", [count for counts, name in rows[block:block + (1 << 16)] for count in counts]).tofile(out_f)
+
+        # pad so the name offsets start on an 8 byte boundary
+        out_f.write(b"\0" * (-out_f.tell() % 8))
+        name_offsets.tofile(out_f)
+        out_f.write(names)
+        out_f.write(strs_bytes)
+
+    ProfileBloomFilter.from_counts((counts for counts, name in rows), len(rows),
+                                   false_positive_rate).save(compiled_filename + _BLOOM_SUFFIX, compiled_filename)
+
+
+class CompiledProfiles(ProfileStore):
+    """
+    DNA profiles memory-mapped from a file written by compile_dna_profiles. Nothing is parsed up front: names and
+    counts are read from the mapping only when a lookup touches them.
+    """
+
+    strs: list[str]  # the STRs, in the order of the count matrix's columns
+    counts: memoryview  # the count matrix, one row of len(strs) counts per person, sorted by counts
+    _name_offsets: memoryview  # where each name starts in the names block, plus where the last one ends
+    _names_start: int  # where the names block starts in the file
+
+    def __init__(self, compiled_filename: str) -> None:
+        """
+        Memory-maps a compiled profiles file.
+
+        Parameters: compiled_filename (str) - A file written by compile_dna_profiles.
+
+        Raises: ValueError - If the file was not written by compile_dna_profiles.
+        """
+        with open(compiled_filename, "rb") as in_f:
+            self._mapped = mmap.mmap(in_f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, num_strs, num_people, names_size, strs_size = _COMPILED_HEADER.unpack_from(self._mapped)
+        if magic != _COMPILED_MAGIC:
+            self._mapped.close()
+            raise ValueError(f"{compiled_filename} is not a compiled profiles file")
+
+        # work out where each section starts
+        counts_start = _COMPILED_HEADER.size
+        offsets_start = counts_start + num_people * num_strs * 4
+        offsets_start += -offsets_start % 8
+        self._names_start = offsets_start + (num_people + 1) * 8
+        strs_start = self._names_start + names_size
+
+        view = memoryview(self._mapped)
+        self.counts = view[counts_start:counts_start + num_people * num_strs * 4].cast("I")
+        self._name_offsets = view[offsets_start:self._names_start].cast("Q")
+        self.strs = self._mapped[strs_start:strs_start + strs_size].decode("ascii").split(",") if num_strs else []
+
+    def __len__(self) -> int:
+        """ Returns the number of people in the profiles. """
+        return len(self._name_offsets) - 1
+
+    def row(self, person: int) -> tuple[int, ...]:
+        """
+        Reads one person's STR counts.
+
+        Parameters: person (int) - The person's row in the count matrix.
+
+        Returns: (tuple) The person's counts, in the same order as strs.
+        """
+        return tuple(self.counts[person * len(self.strs):(person + 1) * len(self.strs)])
+
+    def name(self, person: int) -> str:
+        """
+        Reads one person's name.
+
+        Parameters: person (int) - The person's row in the count matrix.
+
+        Returns: (str) The person's name.
+        """
+        start = self._names_start + self._name_offsets[person]
+        end = self._names_start + self._name_offsets[person + 1]
+        return self._mapped[start:end].decode("utf-8")
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile, by binary search over the sorted
+        count matrix.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> import os, tempfile
+        >>> compiled_filename = os.path.join(tempfile.mkdtemp(), "dna_database.bin")
+        >>> compile_dna_profiles("dna_database.csv", compiled_filename)
+        >>> compiled = CompiledProfiles(compiled_filename)
+        >>> compiled.strs, len(compiled)
+        (['AGAT', 'AATG', 'TATC'], 3)
+        >>> compiled.identify({'AGAT': 6, 'AATG': 1, 'TATC': 5})
+        'Charlie'
+        >>> compiled.identify({'AGAT': 6, 'AATG': 1, 'TATC': 4})
+        'No match'
+        >>> compiled.close()
+        """
+        counts = tuple(mystery_profile[strs] for strs in self.strs)
+        person = bisect_left(range(len(self)), counts, key=self.row)
+
+        # the match must exist and be the only row with these counts
+        if person < len(self) and self.row(person) == counts:
+            if person + 1 == len(self) or self.row(person + 1) != counts:
+                return self.name(person)
+        return "No match"
+
+    def close(self) -> None:
+        """ Releases the memory mapping. """
+        self.counts.release()
+        self._name_offsets.release()
+        self._mapped.close()
+
+
+class ProfileTree(ProfileStore):
+    """
+    A k-d tree over the profiles' STR count vectors, for finding the people whose counts are closest to a mystery
+    profile by L1 distance (the total of the differences in each STR's count). A profile that is off by one in a
+    single STR, say from a read error, is then still found at distance 1. The tree is kept implicitly: people are
+    ordered so each range's middle entry splits the rest on one STR, with no node objects.
+    """
+
+    strs: list[str]  # the STRs, in the order of each count vector
+    names: list[str]  # each person's name
+    vectors: list[tuple[int, ...]]  # each person's counts, in tree order along with names
+
+    def __init__(self, strs: list[str], people: Iterable[tuple[str, tuple[int, ...]]]) -> None:
+        """
+        Builds the tree.
+
+        Parameters: strs (list) - The STRs, in the order of the count vectors.
+        people (Iterable) - Each person's name and count vector.
+        """
+        self.strs = list(strs)
+        people = list(people)
+        self._build(people, 0, len(people), 0)
+        self.names = [name for name, counts in people]
+        self.vectors = [counts for name, counts in people]
+
+    @classmethod
+    def from_profiles(cls, dna_profiles: dict[str, dict[str, int]]) -> "ProfileTree":
+        """
+        Builds a tree from the dictionary returned by create_dna_profiles.
+
+        Parameters: dna_profiles (dict) - The dictionary containing the STR sequence length of each person.
+
+        Returns: (ProfileTree) A tree over the same profiles.
+        """
+        return cls(list(dna_profiles), _dict_profile_rows(dna_profiles))
+
+    def _build(self, people: list[tuple[str, tuple[int, ...]]], low: int, high: int, depth: int) -> None:
+        """
+        Orders people[low:high] into a k-d tree, splitting on the STR for this depth.
+
+        Parameters: people (list) - Every person's name and count vector, reordered in place.
+        low (int) - The start of the range to order.
+        high (int) - The end of the range to order.
+        depth (int) - The depth of the range in the tree.
+        """
+        if high - low <= 1 or not self.strs:
+            return
+        axis = depth % len(self.strs)
+        people[low:high] = sorted(people[low:high], key=lambda person: person[1][axis])
+        middle = (low + high) // 2
+        self._build(people, low, middle, depth + 1)
+        self._build(people, middle + 1, high, depth + 1)
+
+    def nearest(self, mystery_profile: dict[str, int], k: int = 5,
+                tolerance: int | None = None) -> list[tuple[int, str]]:
+        """
+        Finds the people whose STR counts are closest to the given profile.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+        k (int) - The most people to return.
+        tolerance (int) - The largest L1 distance to return, or None for no limit.
+
+        Returns: (list) Up to k (distance, name) pairs, closest first.
+
+        >>> tree = ProfileTree.from_profiles(create_dna_profiles("dna_database.csv"))
+        >>> tree.nearest({'AGAT': 5, 'AATG': 2, 'TATC': 7}, 2)
+        [(1, 'Alice'), (4, 'Charlie')]
+        >>> tree.nearest({'AGAT': 5, 'AATG': 2, 'TATC': 7}, tolerance=3)
+        [(1, 'Alice')]
+        """
+        query = tuple(mystery_profile[strs] for strs in self.strs)
+        best = [] # heap of the closest people found so far, as (-distance, -index) so the farthest is on top
+        limit = float("inf") if tolerance is None else tolerance
+
+        def search(low: int, high: int, depth: int) -> None:
+            """ Searches people[low:high], skipping any side of a split too far from the query. """
+            if low >= high:
+                return
+            middle = (low + high) // 2
+            vector = self.vectors[middle]
+            distance = sum(abs(a - b) for a, b in zip(query, vector))
+            if distance <= limit:
+                heapq.heappush(best, (-distance, -middle))
+                if len(best) > k:
+                    heapq.heappop(best)
+            if low + 1 == high:
+                return
+
+            # search the query's side of the split first, then the far side if it could still hold someone closer
+            axis = depth % len(self.strs)
+            difference = query[axis] - vector[axis]
+            near, far = ((low, middle), (middle + 1, high)) if difference < 0 else ((middle + 1, high), (low, middle))
+            search(*near, depth + 1)
+            if abs(difference) <= bound():
+                search(*far, depth + 1)
+
+        def bound() -> float:
+            """ Returns the largest distance still worth searching. """
+            return min(limit, -best[0][0]) if len(best) == k else limit
+
+        if k > 0:
+            search(0, len(self.vectors), 0)
+        return sorted((-distance, self.names[-index]) for distance, index in best)
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> ProfileTree.from_profiles(create_dna_profiles("dna_database.csv")).identify({'AGAT': 3, 'AATG': 7, 'TATC': 4})
+        'Bob'
+        """
+        matches = self.nearest(mystery_profile, 2, 0)
+        if len(matches) == 1:
+            return matches[0][1]
+        else:
+            return "No match"
+
+
+class ProfileMatrix(ProfileStore):
+    """
+    The DNA profiles held as a people x STRs matrix of counts, so a mystery profile is compared against every person
+    in one vectorized operation instead of a Python loop. With NumPy the matrix is a 2-D array and many mystery
+    profiles can be matched at once by binary search over the sorted rows. Without NumPy it is a flat array, and
+    each query is a single bytes search over the whole matrix.
+    """
+
+    strs: list[str]  # the STRs, in the order of the matrix's columns
+    names: list[str]  # each person's name, in the order of the matrix's rows
+    matrix: "np.ndarray | array"  # the counts, as a 2-D NumPy array or a flat array of rows
+
+    def __init__(self, strs: list[str], names: list[str], counts: Iterable[int]) -> None:
+        """
+        Creates the matrix.
+
+        Parameters: strs (list) - The STRs, in the order of the columns.
+        names (list) - Each person's name, in the order of the rows.
+        counts (Iterable) - Every count, row by row.
+        """
+        self.strs = list(strs)
+        self.names = list(names)
+        self.matrix = array("q", counts)
+        if np is not None:
+            self.matrix = np.frombuffer(self.matrix, dtype=np.int64).reshape(len(self.names), len(self.strs))
+        self._sorted_rows = None
+        self._matrix_bytes = None
+
+    @classmethod
+    def from_profiles(cls, dna_profiles: dict[str, dict[str, int]]) -> "ProfileMatrix":
+        """
+        Builds a matrix from the dictionary returned by create_dna_profiles.
+
+        Parameters: dna_profiles (dict) - The dictionary containing the STR sequence length of each person.
+
+        Returns: (ProfileMatrix) A matrix of the same profiles.
+        """
+        people = list(_dict_profile_rows(dna_profiles))
+        return cls(list(dna_profiles), [name for name, counts in people],
+                   (count for name, counts in people for count in counts))
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> create_profile_matrix("dna_database.csv").identify({'AGAT': 6, 'AATG': 1, 'TATC': 5})
+        'Charlie'
+        """
+        counts = [mystery_profile[strs] for strs in self.strs]
+        if np is not None:
+            matches = np.flatnonzero((self.matrix == np.array(counts, dtype=np.int64)).all(axis=1)).tolist()
+        else:
+            # search the raw bytes of the matrix, keeping only hits that line up with the start of a row
+            if self._matrix_bytes is None:
+                self._matrix_bytes = self.matrix.tobytes()
+            matrix_bytes = self._matrix_bytes
+            row_bytes = array("q", counts).tobytes()
+            matches = []
+            position = matrix_bytes.find(row_bytes)
+            while position != -1 and len(matches) < 2:
+                if position % len(row_bytes) == 0:
+                    matches.append(position // len(row_bytes))
+                position = matrix_bytes.find(row_bytes, position + 1)
+
+        # if there is only 1 possible name, return it, otherwise return "No match"
+        if len(matches) == 1:
+            return self.names[matches[0]]
+        else:
+            return "No match"
+
+    def identify_many(self, mystery_profiles: list[dict[str, int]]) -> list[str]:
+        """
+        Finds the matching person for each of many mystery profiles. With NumPy the rows are sorted once and every
+        profile is looked up by a vectorized binary search.
+
+        Parameters: mystery_profiles (list) - The maximum consecutive count of each STR in each mystery sequence.
+
+        Returns: (list) The name of each profile's matching person, or "No match".
+
+        >>> matrix = create_profile_matrix("dna_database.csv")
+        >>> matrix.identify_many([{'AGAT': 3, 'AATG': 7, 'TATC': 4}, {'AGAT': 1, 'AATG': 1, 'TATC': 1}])
+        ['Bob', 'No match']
+        """
+        if np is None or not self.strs:
+            return [self.identify(mystery_profile) for mystery_profile in mystery_profiles]
+
+        # view each row as a single opaque value, so rows can be sorted and searched as a whole
+        row_type = np.dtype((np.void, len(self.strs) * 8))
+        if self._sorted_rows is None:
+            rows = np.ascontiguousarray(self.matrix).view(row_type).ravel()
+            order = np.argsort(rows, kind="stable")
+            self._sorted_rows = (rows[order], order)
+        sorted_rows, order = self._sorted_rows
+
+        queries = np.array([[mystery_profile[strs] for strs in self.strs] for mystery_profile in mystery_profiles],
+                           dtype=np.int64).reshape(len(mystery_profiles), len(self.strs))
+        queries = queries.view(row_type).ravel()
+        lows = np.searchsorted(sorted_rows, queries, "left")
+        highs = np.searchsorted(sorted_rows, queries, "right")
+
+        # a profile matches when exactly one row equals it
+        return [self.names[order[low]] if high - low == 1 else "No match"
+                for low, high in zip(lows.tolist(), highs.tolist())]
+
+
+@instrumented(_file_size)
+def create_profile_matrix(profiles_filename: str) -> ProfileMatrix:
+    """
+    This function loads the dna profiles straight into a ProfileMatrix.
+
+    Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+
+    Returns: (ProfileMatrix) A matrix of every person's STR counts.
+
+    >>> matrix = create_profile_matrix("dna_database.csv")
+    >>> matrix.names
+    ['Alice', 'Bob', 'Charlie']
+    >>> [list(matrix.matrix[row * 3:row * 3 + 3]) if np is None else matrix.matrix[row].tolist() for row in range(3)]
+    [[5, 2, 8], [3, 7, 4], [6, 1, 5]]
+    """
+    names = [] # each person's name
+    counts = array("q") # every count, row by row
+
+    with _open_profile_rows(profiles_filename) as (strs, rows):
+        for name, person_counts in rows:
+            names.append(name)
+            counts.extend(person_counts)
+    return ProfileMatrix(strs, names, counts)
+
+
+MISSING = -1 # count stored for an STR that a person's lab did not type
+
+
+class MergedProfiles(ProfileStore):
+    """
+    DNA profiles from several labs' CSVs, whose STR columns may differ and come in any order, merged into one
+    columnar store. Every STR seen in any file gets a column of counts, with MISSING for people whose file did not
+    have it. Identification only compares STRs that are present on both sides.
+    """
+
+    strs: list[str]  # every STR in any of the files, in order of first appearance
+    names: list[str]  # each person's name
+    columns: list[array]  # one column of counts per STR, MISSING where a person's file lacked the STR
+    files: list[str]  # every file loaded, in the order they were loaded
+    sources: array  # for each person, the index in files of the file they came from
+
+    def __init__(self) -> None:
+        """ Creates an empty store. """
+        self.strs = []
+        self.names = []
+        self.columns = []
+        self.files = []
+        self.sources = array("I")
+
+    def load(self, profiles_filename: str) -> None:
+        """
+        Streams one more profiles CSV into the store, lining its STR columns up with the store's. Rows go straight
+        into the columns, with no per-file dictionaries built along the way.
+
+        Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+
+        Raises: ValueError - If the header repeats an STR or a row does not have one count per STR. Nothing from
+        the file is added to the store before its header is checked, but rows before a bad one are kept.
+        """
+        with _open_profile_rows(profiles_filename) as (file_strs, rows):
+            source = len(self.files)
+            self.files.append(profiles_filename)
+
+            # find the store column for each of the file's STRs, adding columns for STRs not seen before
+            column_of = {target: index for index, target in enumerate(self.strs)}
+            file_columns = []
+            for target in file_strs:
+                if target not in column_of:
+                    column_of[target] = len(self.strs)
+                    self.strs.append(target)
+                    self.columns.append(array("q", [MISSING]) * len(self.names))
+                file_columns.append(self.columns[column_of[target]])
+            missing_columns = [column for column in self.columns if not any(column is c for c in file_columns)]
+
+            for name, counts in rows:
+                self.names.append(name)
+                self.sources.append(source)
+                for column, count in zip(file_columns, counts):
+                    column.append(count)
+                for column in missing_columns:
+                    column.append(MISSING)
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts match the given profile on every STR both have, sharing at least one.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of some or all STRs in the mystery
+        sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+        """
+        return self.identify_with_source(mystery_profile)[0]
+
+    def identify_with_source(self, mystery_profile: dict[str, int]) -> tuple[str, str | None]:
+        """
+        Finds the one person whose STR counts match the given profile, as identify does, and which file (which lab)
+        they came from.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of some or all STRs in the mystery
+        sequence.
+
+        Returns: (tuple) The name of the matching person, or "No match", and the file they came from, or None.
+
+        >>> import os, tempfile
+        >>> east_filename = os.path.join(tempfile.mkdtemp(), "east.csv")
+        >>> with open(east_filename, "w") as out_f:
+        ...     _ = out_f.write("name,TATC,GATA\\nDana,4,9\\nEve,7,2\\n")
+        >>> merged = merge_dna_profiles(["dna_database.csv", east_filename])
+        >>> merged.strs, list(merged.columns[3])
+        (['AGAT', 'AATG', 'TATC', 'GATA'], [-1, -1, -1, 9, 2])
+        >>> merged.identify({'AGAT': 3, 'AATG': 7, 'TATC': 4, 'GATA': 1})
+        'Bob'
+        >>> merged.identify({'AGAT': 3, 'AATG': 7, 'TATC': 4, 'GATA': 9})
+        'No match'
+        >>> merged.identify({'TATC': 7, 'GATA': 2}), merged.identify({'TATC': 8, 'GATA': 2})
+        ('Eve', 'Alice')
+        >>> merged.identify_with_source({'TATC': 7, 'GATA': 2}) == ('Eve', east_filename)
+        True
+        >>> merged.identify_with_source({'TATC': 1})
+        ('No match', None)
+        >>> with open(east_filename, "w") as out_f:
+        ...     _ = out_f.write("name,AGAT,AATG\\nX,1,2\\nY,3\\nZ,5,6\\n")
+        >>> merged.load(east_filename)  # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+        ...
+        ValueError: .../east.csv, line 3: expected 3 fields, found 2
+        """
+        # narrow the candidates one STR at a time, keeping people who match or lack that STR
+        shared = [(column, mystery_profile[target]) for target, column in zip(self.strs, self.columns)
+                  if target in mystery_profile]
+        if np is not None:
+            candidates = np.ones(len(self.names), dtype=bool)
+            typed = np.zeros(len(self.names), dtype=bool)
+            for column, count in shared:
+                counts = np.frombuffer(column, dtype=np.int64)
+                candidates &= (counts == count) | (counts == MISSING)
+                typed |= counts != MISSING
+            matches = np.flatnonzero(candidates & typed).tolist()
+        else:
+            matches = range(len(self.names))
+            for column, count in shared:
+                matches = [person for person in matches if column[person] == count or column[person] == MISSING]
+            matches = [person for person in matches if any(column[person] != MISSING for column, count in shared)]
+
+        # if there is only 1 possible name, return it, otherwise return "No match"
+        if len(matches) == 1:
+            return self.names[matches[0]], self.files[self.sources[matches[0]]]
+        else:
+            return "No match", None
+
+
+def merge_dna_profiles(profiles_filenames: list[str]) -> MergedProfiles:
+    """
+    This function merges several profiles CSVs, whose STR columns may differ, into one MergedProfiles store.
+
+    Parameters: profiles_filenames (list) - The profiles CSVs to merge.
+
+    Returns: (MergedProfiles) The merged store.
+
+    >>> identify_dna(read_dna_sequence("alice.txt"), merge_dna_profiles(["dna_database.csv"]))
+    'Alice'
+    """
+    merged = MergedProfiles()
+    for profiles_filename in profiles_filenames:
+        merged.load(profiles_filename)
+    return merged
+
+
+_BLOOM_MAGIC = b"DNABLOM2"
+_BLOOM_HEADER = struct.Struct("=8sQIdQQq")  # magic, bits, hashes, false positive rate, capacity, source size and mtime
+_BLOOM_SUFFIX = ".bloom"  # added to a compiled profiles filename for its saved filter
+
+
+class ProfileBloomFilter:
+    """
+    A Bloom filter over the full STR count tuples of a profile database. It can say for certain that nobody has a
+    count tuple, in a fixed number of bit lookups, while only a small, configurable fraction of absent tuples are
+    let through as possible matches. It takes about 10 bits per person at a 1% false positive rate.
+    """
+
+    bits: bytearray | memoryview  # the filter's bits, 8 to a byte (memory-mapped when loaded from a file)
+    num_bits: int  # the number of bits in the filter
+    num_hashes: int  # the number of bits set for each count tuple
+    capacity: int  # the number of count tuples the filter was sized for
+    false_positive_rate: float  # the false positive rate the filter was sized for
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01) -> None:
+        """
+        Creates an empty filter sized for the given number of count tuples.
+
+        Parameters: capacity (int) - The number of count tuples the filter will hold.
+        false_positive_rate (float) - The fraction of absent count tuples allowed to pass once the filter is full.
+
+        Raises: ValueError - If the false positive rate is not between 0 and 1.
+        """
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(f"false positive rate must be between 0 and 1, not {false_positive_rate}")
+
+        # the standard sizes: m = -n ln(p) / ln(2)^2 bits and k = (m / n) ln(2) hashes
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    @classmethod
+    def from_counts(cls, counts: Iterable[tuple[int, ...]], capacity: int,
+                    false_positive_rate: float = 0.01) -> "ProfileBloomFilter":
+        """
+        Builds a filter holding the given count tuples.
+
+        Parameters: counts (Iterable) - The count tuples.
+        capacity (int) - The number of count tuples.
+        false_positive_rate (float) - The fraction of absent count tuples allowed to pass.
+
+        Returns: (ProfileBloomFilter) The filter.
+
+        >>> screen = ProfileBloomFilter.from_counts([(5, 2, 8), (3, 7, 4), (6, 1, 5)], 3)
+        >>> screen.num_bits, screen.num_hashes
+        (29, 7)
+        >>> (3, 7, 4) in screen, (3, 7, 5) in screen
+        (True, False)
+        """
+        screen = cls(capacity, false_positive_rate)
+        for count_tuple in counts:
+            screen.add(count_tuple)
+        return screen
+
+    @classmethod
+    def open(cls, filter_filename: str, source_filename: str) -> "ProfileBloomFilter | None":
+        """
+        Memory-maps a filter written by save, so it is ready to use without being rebuilt or read in. A filter is
+        only returned if it was saved for the source file as that file is now (same size and modification time),
+        since a stale filter would answer "No match" for people it has never seen.
+
+        Parameters: filter_filename (str) - A file written by save.
+        source_filename (str) - The file the filter's count tuples were taken from.
+
+        Returns: (ProfileBloomFilter) The filter, or None if the file is not a saved filter for the source file.
+
+        >>> import os, tempfile
+        >>> filter_filename = os.path.join(tempfile.mkdtemp(), "profiles.bloom")
+        >>> ProfileBloomFilter.from_counts([(5, 2, 8), (3, 7, 4)], 2).save(filter_filename, "dna_database.csv")
+        >>> screen = ProfileBloomFilter.open(filter_filename, "dna_database.csv")
+        >>> (5, 2, 8) in screen, (5, 2, 9) in screen, screen.capacity, screen.false_positive_rate
+        (True, False, 2, 0.01)
+        >>> ProfileBloomFilter.open(filter_filename, "bob.txt") is None
+        True
+        """
+        with open(filter_filename, "rb") as in_f:
+            mapped = mmap.mmap(in_f.fileno(), 0, access=mmap.ACCESS_READ)
+        source = os.stat(source_filename)
+        header = _BLOOM_HEADER.unpack_from(mapped) if len(mapped) >= _BLOOM_HEADER.size else None
+        if header is None or header[0] != _BLOOM_MAGIC or header[5:] != (source.st_size, source.st_mtime_ns):
+            mapped.close()
+            return None
+
+        screen = cls.__new__(cls)
+        magic, screen.num_bits, screen.num_hashes, screen.false_positive_rate, screen.capacity = header[:5]
+        screen.bits = memoryview(mapped)[_BLOOM_HEADER.size:_BLOOM_HEADER.size + (screen.num_bits + 7) // 8]
+        return screen
+
+    def save(self, filter_filename: str, source_filename: str) -> None:
+        """
+        Writes the filter to a file that open can memory-map, tied to the current size and modification time of
+        the file its count tuples came from. The file is written under a temporary name and then renamed, so it is
+        never seen half written.
+
+        Parameters: filter_filename (str) - The file to write.
+        source_filename (str) - The file the filter's count tuples were taken from.
+        """
+        source = os.stat(source_filename)
+        with open(filter_filename + ".tmp", "wb") as out_f:
+            out_f.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, self.num_bits, self.num_hashes, self.false_positive_rate,
+                                           self.capacity, source.st_size, source.st_mtime_ns))
+            out_f.write(self.bits)
+        os.replace(filter_filename + ".tmp", filter_filename)
+
+    def _positions(self, counts: tuple[int, ...]) -> Iterator[int]:
+        """
+        Finds the bits for a count tuple, by double hashing one 128 bit digest.
+
+        Parameters: counts (tuple) - The STR counts.
+
+        Returns: (Iterator) The position of each of the tuple's bits.
+        """
+        first, second = struct.unpack("<QQ", hashlib.blake2b(array("q", counts).tobytes(), digest_size=16).digest())
+        second |= 1 # odd, so the positions do not repeat when num_bits is even
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, counts: tuple[int, ...]) -> None:
+        """
+        Adds a count tuple to the filter.
+
+        Parameters: counts (tuple) - The STR counts.
+        """
+        for position in self._positions(counts):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, counts: tuple[int, ...]) -> bool:
+        """ Returns False if nobody has the count tuple, or True if somebody might. """
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(counts))
+
+
+class ScreenedProfiles(ProfileStore):
+    """
+    A ProfileStore behind a ProfileBloomFilter of its count tuples. Mystery profiles the filter rules out are
+    answered "No match" straight away, and only possible matches reach the store.
+    """
+
+    strs: list[str]  # the STRs, in the order of the filter's count tuples
+    dna_profiles: ProfileStore  # the store that possible matches are looked up in
+    screen: ProfileBloomFilter  # the filter over every person's count tuple
+    screened: int  # the number of lookups the filter has answered by itself
+
+    def __init__(self, dna_profiles: ProfileStore, screen: ProfileBloomFilter) -> None:
+        """
+        Puts a filter in front of a store.
+
+        Parameters: dna_profiles (ProfileStore) - The store.
+        screen (ProfileBloomFilter) - A filter holding every count tuple in the store, in the order of its strs.
+        """
+        self.strs = dna_profiles.strs
+        self.dna_profiles = dna_profiles
+        self.screen = screen
+        self.screened = 0
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile, checking the filter first.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> screened = load_profiles("dna_database.csv", false_positive_rate=0.01)
+        >>> screened.identify({'AGAT': 3, 'AATG': 7, 'TATC': 4}), screened.identify({'AGAT': 3, 'AATG': 7, 'TATC': 5})
+        ('Bob', 'No match')
+        >>> screened.screened
+        1
+        """
+        if tuple(mystery_profile[strs] for strs in self.strs) not in self.screen:
+            self.screened += 1
+            return "No match"
+        return self.dna_profiles.identify(mystery_profile)
+
+
+def load_profiles(profiles_filename: str, false_positive_rate: float | None = None) -> ProfileStore:
+    """
+    This function loads dna profiles from either a CSV or a file written by compile_dna_profiles, whichever the
+    file is, optionally with a ProfileBloomFilter of everyone's counts to screen out non-matches. For a CSV the
+    filter is built while loading. For a compiled file the filter saved by compile_dna_profiles is memory-mapped,
+    unless it is missing, was saved for a different version of the file, or has a different false positive rate;
+    then a filter is built from the rows instead.
+
+    Parameters: profiles_filename (str) - The CSV or compiled profiles file.
+    false_positive_rate (float) - The false positive rate of the filter, or None for no filter.
+
+    Returns: (ProfileStore) The loaded profiles, as ScreenedProfiles if a filter was built.
+
+    >>> load_profiles("dna_database.csv").strs
+    ['AGAT', 'AATG', 'TATC']
+    >>> load_profiles("dna_database.csv", false_positive_rate=0.01).screen.num_bits
+    29
+    >>> import os, tempfile
+    >>> compiled_filename = os.path.join(tempfile.mkdtemp(), "dna_database.bin")
+    >>> compile_dna_profiles("dna_database.csv", compiled_filename)
+    >>> type(load_profiles(compiled_filename, false_positive_rate=0.01).screen.bits).__name__
+    'memoryview'
+    >>> type(load_profiles(compiled_filename, false_positive_rate=0.001).screen.bits).__name__
+    'bytearray'
+
+    A filter left over from an earlier compile is not trusted:
+
+    >>> os.replace(compiled_filename + ".bloom", compiled_filename + ".old")
+    >>> with open(os.path.join(os.path.dirname(compiled_filename), "more.csv"), "w") as out_f:
+    ...     _ = out_f.write("name,AGAT,AATG,TATC\\nZed,1,2,3\\nYves,4,5,6\\n")
+    >>> compile_dna_profiles(out_f.name, compiled_filename)
+    >>> os.replace(compiled_filename + ".old", compiled_filename + ".bloom")
+    >>> load_profiles(compiled_filename, false_positive_rate=0.01).identify({'AGAT': 1, 'AATG': 2, 'TATC': 3})
+    'Zed'
+    """
+    with open(profiles_filename, "rb") as in_f:
+        is_compiled = in_f.read(len(_COMPILED_MAGIC)) == _COMPILED_MAGIC
+    if is_compiled:
+        dna_profiles = CompiledProfiles(profiles_filename)
+        if false_positive_rate is None:
+            return dna_profiles
+        screen = None
+        if os.path.exists(profiles_filename + _BLOOM_SUFFIX):
+            screen = ProfileBloomFilter.open(profiles_filename + _BLOOM_SUFFIX, profiles_filename)
+        if screen is None or screen.false_positive_rate != false_positive_rate or screen.capacity != len(dna_profiles):
+            # no usable saved filter, so build one from the rows
+            counts = (dna_profiles.row(person) for person in range(len(dna_profiles)))
+            screen = ProfileBloomFilter.from_counts(counts, len(dna_profiles), false_positive_rate)
+    else:
+        dna_profiles = create_profile_index(profiles_filename)
+        if false_positive_rate is None:
+            return dna_profiles
+        screen = ProfileBloomFilter.from_counts(dna_profiles.index, len(dna_profiles.index), false_positive_rate)
+    return ScreenedProfiles(dna_profiles, screen)
+
+
+class LazyProfiles(ProfileStore):
+    """
+    DNA profiles that are only loaded, with load_profiles, when the first identify call needs them. Until then
+    just the STRs are read from the file's header, which is all that counting a sequence needs.
+    """
+
+    strs: list[str]  # the STRs, from the file's header
+    profiles_filename: str  # the CSV or compiled profiles file
+    false_positive_rate: float | None  # passed on to load_profiles
+    _dna_profiles: ProfileStore | None  # the loaded profiles, or None until they are needed
+
+    def __init__(self, profiles_filename: str, false_positive_rate: float | None = None) -> None:
+        """
+        Reads the STRs from a profiles file's header.
+
+        Parameters: profiles_filename (str) - The CSV or compiled profiles file.
+        false_positive_rate (float) - The false positive rate of a ProfileBloomFilter to load with, or None.
+        """
+        self.profiles_filename = profiles_filename
+        self.false_positive_rate = false_positive_rate
+        self._dna_profiles = None
+
+        with open(profiles_filename, "rb") as in_f:
+            header = in_f.read(_COMPILED_HEADER.size)
+            if header[:len(_COMPILED_MAGIC)] == _COMPILED_MAGIC:
+
+                # the STRs come last in a compiled file, after the counts, name offsets and names
+                magic, num_strs, num_people, names_size, strs_size = _COMPILED_HEADER.unpack(header)
+                offsets_start = _COMPILED_HEADER.size + num_people * num_strs * 4
+                offsets_start += -offsets_start % 8
+                in_f.seek(offsets_start + (num_people + 1) * 8 + names_size)
+                self.strs = in_f.read(strs_size).decode("ascii").split(",") if num_strs else []
+                return
+        with _open_profile_rows(profiles_filename) as (self.strs, rows):
+            pass
+
+    def load(self) -> ProfileStore:
+        """
+        Loads the profiles, if they are not loaded yet.
+
+        Returns: (ProfileStore) The loaded profiles.
+        """
+        if self._dna_profiles is None:
+            with record_phase("load_profiles", os.path.getsize(self.profiles_filename)):
+                self._dna_profiles = load_profiles(self.profiles_filename, self.false_positive_rate)
+        return self._dna_profiles
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile, loading the profiles first if
+        this is the first lookup.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> lazy = LazyProfiles("dna_database.csv")
+        >>> lazy.strs, lazy._dna_profiles
+        (['AGAT', 'AATG', 'TATC'], None)
+        >>> lazy.identify({'AGAT': 5, 'AATG': 2, 'TATC': 8}), type(lazy._dna_profiles).__name__
+        ('Alice', 'ProfileIndex')
+        >>> import os, tempfile
+        >>> compiled_filename = os.path.join(tempfile.mkdtemp(), "dna_database.bin")
+        >>> compile_dna_profiles("dna_database.csv", compiled_filename)
+        >>> LazyProfiles(compiled_filename).strs
+        ['AGAT', 'AATG', 'TATC']
+        """
+        return self.load().identify(mystery_profile)
+
+
+def match_profile(mystery_profile: dict[str, int],
+                  dna_profiles: dict[str, dict[str, int]] | ProfileStore) -> str:
+    """
+    This function finds which person has exactly the given STR counts.
+
+    Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+    dna_profiles (dict or ProfileStore) - The STR sequence length of each person.
+
+    Returns (str): The name of the matching person, or "No match".
+
+    >>> match_profile({'AGAT': 3, 'AATG': 7, 'TATC': 4}, create_dna_profiles("dna_database.csv"))
+    'Bob'
+    """
+    if isinstance(dna_profiles, dict):
+        dna_profiles = ProfileIndex.from_profiles(dna_profiles)
+    return dna_profiles.identify(mystery_profile)
+
+
+def identify_dna(mystery_dna: str | PackedDNA, dna_profiles: dict[str, dict[str, int]] | ProfileStore,) -> str:
+    """
+    This function finds which person is associated with the given dna sequence.
+
+    Parameters: mystery_dna (str or PackedDNA) - The dna sequence to be identified.
+    dna_profiles (dict or ProfileStore) - The STR sequence length of each person.
+
+    Returns (str): The name of the person associated with the mystery dna sequence.
+
+    >>> identify_dna(read_dna_sequence("bob.txt"), create_dna_profiles("dna_database.csv"))
+    'Bob'
+    >>> identify_dna(read_dna_sequence("alice.txt"), create_dna_profiles("dna_database.csv"))
+    'Alice'
+    >>> identify_dna(read_dna_sequence("charlie.txt"), create_dna_profiles("dna_database.csv"))
+    'Charlie'
+    >>> identify_dna(read_dna_sequence("nomatch.txt"), create_dna_profiles("dna_database.csv"))
+    'No match'
+    >>> identify_dna(read_dna_sequence("charlie.txt"), create_profile_index("dna_database.csv"))
+    'Charlie'
+    >>> identify_dna(PackedDNA(read_dna_sequence("bob.txt")), create_dna_profiles("dna_database.csv"))
+    'Bob'
+    """
+    if isinstance(dna_profiles, dict):
+        dna_profiles = ProfileIndex.from_profiles(dna_profiles)
+
+    # create mystery dna profile for every STR in a single pass over the sequence
+    return dna_profiles.identify(find_all_max_consecutive(mystery_dna, dna_profiles.strs))
+
+
+def identify_dna_either_strand(mystery_dna: str | PackedDNA,
+                               dna_profiles: dict[str, dict[str, int]] | ProfileStore) -> str:
+    """
+    This function finds which person is associated with the given dna sequence, whichever strand it was
+    sequenced from. Both strands are profiled in one pass; the forward strand's match is preferred.
+
+    Parameters: mystery_dna (str or PackedDNA) - The dna sequence to be identified.
+    dna_profiles (dict or ProfileStore) - The STR sequence length of each person.
+
+    Returns (str): The name of the person associated with the mystery dna sequence.
+
+    >>> identify_dna_either_strand(reverse_complement(read_dna_sequence("alice.txt")), create_dna_profiles("dna_database.csv"))
+    'Alice'
+    >>> identify_dna_either_strand(read_dna_sequence("charlie.txt"), create_dna_profiles("dna_database.csv"))
+    'Charlie'
+    """
+    if isinstance(dna_profiles, dict):
+        dna_profiles = ProfileIndex.from_profiles(dna_profiles)
+
+    counts = find_strand_max_consecutive(mystery_dna, dna_profiles.strs)
+    result = dna_profiles.identify(counts["forward"])
+    if result == "No match":
+        result = dna_profiles.identify(counts["reverse"])
+    return result
+
+
+_SEQUENCE_ARTIFACT_SUFFIXES = (".sa",)  # files written next to sequences that are not samples themselves
+
+
+def list_sequence_files(source: str) -> list[str]:
+    """
+    This function lists the sequence files for a batch run. The source is either a directory, in which case every
+    file in it is a sequence file apart from hidden files and the suffix indexes written by dna_suffix_index, or
+    a manifest file listing one sequence filename per line (relative names are taken relative to the manifest).
+
+    Parameters: source (str) - A directory of sequence files, or a manifest file.
+
+    Returns: (list) The sequence filenames.
+
+    >>> import dna_suffix_index, os, shutil, tempfile
+    >>> workdir = tempfile.mkdtemp()
+    >>> _ = shutil.copy("alice.txt", workdir)
+    >>> _ = dna_suffix_index.build_suffix_index(os.path.join(workdir, "alice.txt"))
+    >>> [os.path.basename(filename) for filename in list_sequence_files(workdir)]
+    ['alice.txt']
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if os.path.isfile(os.path.join(source, name)) and not name.startswith(".")
+                      and not name.endswith(_SEQUENCE_ARTIFACT_SUFFIXES))
+
+    with open(source, "r") as in_f:
+        return [os.path.join(os.path.dirname(source), line.strip()) for line in in_f if line.strip()]
+
+
+def _count_sequence_file(sequence_filename: str, strs: list[str]) -> tuple[str, dict[str, int], int]:
+    """
+    Counts the STRs in one sequence file. This runs in a batch worker process.
+
+    Parameters: sequence_filename (str) - filename of the DNA sequence
+    strs (list) - The STRs to count.
+
+    Returns: (tuple) The filename, its STR counts, and the number of bases read.
+    """
+    bases = 0 # number of bases read from the file
+
+    def counted(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """ Passes the chunks through, adding up their bases. """
+        nonlocal bases
+        for chunk in chunks:
+            bases += len(chunk)
+            yield chunk
+
+    mystery_profile = find_max_consecutive_in_chunks(counted(read_dna_chunks(sequence_filename)), strs)
+    return sequence_filename, mystery_profile, bases
+
+
+def identify_batch(sequence_filenames: list[str], dna_profiles: ProfileStore, workers: int | None = None,
+                   exporter: ProfileExporter | None = None) -> Iterator[tuple[str, str, int]]:
+    """
+    This function identifies many sequence files against one loaded profile database. The STR counting is spread
+    over a pool of worker processes, and results are yielded as each file finishes, so they may come back in any
+    order. A file that cannot be read or counted is reported with "error: " and the reason in place of a name,
+    and the rest of the batch carries on.
+
+    Parameters: sequence_filenames (list) - The sequence files to identify.
+    dna_profiles (ProfileStore) - The loaded profile database.
+    workers (int) - The number of worker processes, or None for one per CPU.
+    exporter (dna_export.ProfileExporter) - Where to write each file's STR counts as it finishes, or None to not keep them.
+
+    Returns: (Iterator) For each file, its filename, the identified name (or "No match", or the error) and its
+    number of bases.
+
+    >>> sorted(identify_batch(["alice.txt", "bob.txt", "nomatch.txt"], create_profile_index("dna_database.csv"), 2))
+    [('alice.txt', 'Alice', 122), ('bob.txt', 'Bob', 103), ('nomatch.txt', 'No match', 133)]
+    >>> sorted(identify_batch(["bob.txt", "missing.txt"], create_profile_index("dna_database.csv"), 2))
+    [('bob.txt', 'Bob', 103), ('missing.txt', "error: [Errno 2] No such file or directory: 'missing.txt'", 0)]
+    """
+    with futures.ProcessPoolExecutor(workers) as pool:
+        pending = {pool.submit(_count_sequence_file, sequence_filename, dna_profiles.strs): sequence_filename
+                   for sequence_filename in sequence_filenames}
+        for future in futures.as_completed(pending):
+            try:
+                sequence_filename, mystery_profile, bases = future.result()
+            except Exception as error:
+                yield pending[future], f"error: {error}", 0
+                continue
+            if exporter is not None:
+                exporter.write(sequence_filename, mystery_profile)
+            yield sequence_filename, dna_profiles.identify(mystery_profile), bases
+
+
+def batch_main(source: str, profiles_filename: str, workers: int | None = None,
+               export_filename: str | None = None) -> None:
+    """
+    This function runs identify_batch over a directory or manifest of sequence files, printing a "filename,result"
+    line as each file finishes (or "filename,error: ..." for a file that failed) and a throughput summary to
+    stderr at the end. If an export file is given, every
+    file's STR counts are also written to it with dna_export.ProfileExporter, with the CSV view next to it.
+
+    Parameters: source (str) - A directory of sequence files, or a manifest file.
+    profiles_filename (str) - filename of the dna database, either the CSV or compiled with --compile
+    workers (int) - The number of worker processes, or None for one per CPU.
+    export_filename (str) - The binary file to export the counts to (the CSV view gets ".csv" added), or None.
+    """
+    start_time = time.perf_counter()
+    dna_profiles = load_profiles(profiles_filename)
+    exporter = None
+    if export_filename is not None:
+        import dna_export
+        exporter = dna_export.ProfileExporter(export_filename, export_filename + ".csv", dna_profiles.strs)
+    samples = 0 # number of files identified
+    failed = 0 # number of files that could not be read or counted
+    total_bases = 0 # number of bases read across all files
+
+    for sequence_filename, result, bases in identify_batch(list_sequence_files(source), dna_profiles, workers,
+                                                           exporter):
+        print(f"{sequence_filename},{result}", flush=True)
+        if result.startswith("error: "):
+            failed += 1
+        else:
+            samples += 1
+        total_bases += bases
+    if exporter is not None:
+        exporter.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{samples} samples ({failed} failed), {total_bases} bases in {elapsed:.3f} s "
+          f"({samples / elapsed:.1f} samples/s, {total_bases / elapsed:.0f} bases/s)", file=stderr)
+
+
+def fasta_main(fasta_filename: str, profiles_filename: str) -> None:
+    """
+    This function identifies every record of a FASTA file, printing a "record,result" line for each.
+
+    Parameters: fasta_filename (str) - Name of the FASTA file, plain or gzip compressed.
+    profiles_filename (str) - filename of the dna database, either the CSV or compiled with --compile
+
+    >>> import os, tempfile
+    >>> fasta_filename = os.path.join(tempfile.mkdtemp(), "samples.fa")
+    >>> with open(fasta_filename, "w") as out_f:
+    ...     _ = out_f.write(">bob\\n" + read_dna_sequence("bob.txt") + "\\n>nomatch\\n" + read_dna_sequence("nomatch.txt"))
+    >>> fasta_main(fasta_filename, "dna_database.csv")
+    bob,Bob
+    nomatch,No match
+    """
+    dna_profiles = load_profiles(profiles_filename)
+    for name, mystery_profile in count_fasta_records(fasta_filename, dna_profiles.strs):
+        print(f"{name},{dna_profiles.identify(mystery_profile)}", flush=True)
+
+
+def read_stream_sequence(in_f: Any, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """
+    Reads a sequence from a stream as it arrives, in chunks of whatever has arrived so far. Line breaks are
+    treated as wrapping, so the sequence may come in lines of any length; bases are uppercased, so soft-masked
+    repeats still count; and FASTA header lines (starting with ">") are skipped. Every record is read as part of
+    one sequence, so a file of several records should be identified with fasta_main instead.
+
+    Parameters: in_f (BufferedReader) - The binary stream, such as stdin.buffer.
+    chunk_size (int) - The largest number of bytes to read at a time.
+
+    Returns: (Iterator) An iterator over bytes chunks of the sequence.
+
+    >>> import io
+    >>> b"".join(read_stream_sequence(io.BytesIO(b">sample AGAT\\nagatAG\\nAT\\r\\n"), 4))
+    b'AGATAGAT'
+    """
+    at_line_start = True # whether the next byte read starts a line
+    in_header = False # whether the bytes being read are part of a header line
+    while chunk := in_f.read1(chunk_size):
+        sequence = [] # the parts of the chunk that are sequence
+        for index, piece in enumerate(chunk.split(b"\n")):
+            if index > 0:
+                at_line_start, in_header = True, False
+            if at_line_start and piece.startswith(b">"):
+                in_header = True
+            if piece:
+                at_line_start = False
+            if not in_header:
+                sequence.append(piece)
+        yield b"".join(sequence).translate(None, b" \t\r").upper()
+
+
+def stdin_main(profiles_filename: str, report_every: int = 1 << 20) -> None:
+    """
+    This function identifies a sequence piped in on stdin as it arrives, read with read_stream_sequence. Every
+    report_every bases it prints the identification so far to stderr (when it has changed), and at the end it
+    prints the final result.
+
+    Parameters: profiles_filename (str) - filename of the dna database, either the CSV or compiled with --compile
+    report_every (int) - How many bases to read between progress reports.
+    """
+    dna_profiles = load_profiles(profiles_filename)
+    counter = STRCounter(dna_profiles.strs)
+    next_report = report_every # position at which to print the next progress report
+    result = None # the last identification reported
+
+    for chunk in read_stream_sequence(stdin.buffer):
+        counter.feed(chunk)
+        if counter.position >= next_report:
+            next_report = counter.position + report_every
+            if (new_result := dna_profiles.identify(counter.snapshot())) != result:
+                result = new_result
+                print(f"after {counter.position} bases: {result}", file=stderr, flush=True)
+    print(dna_profiles.identify(counter.snapshot()))
+
+
+def discover_main(sequence_filename: str, top_k: int = 10) -> None:
+    """
+    This function prints the motifs forming the longest tandem runs in a sequence file, one "motif,copies,position"
+    line each.
+
+    Parameters: sequence_filename (str) - filename of the DNA sequence
+    top_k (int) - The number of motifs to print.
+
+    >>> discover_main("bob.txt", 2)
+    AATG,7,75
+    GC,5,6
+    """
+    for motif, copies, position in discover_tandem_repeats(read_dna_sequence(sequence_filename), top_k):
+        print(f"{motif},{copies},{position}")
+
+
+# keep the following code at the END of your file, as per convention
+def main(sequence_filename: str, profiles_filename: str, cache_filename: str | None = None,
+         false_positive_rate: float | None = None) -> None:
+    """
+    This function executes identify_dna() which calls the other functions and prints out the name of the mystery person.
+
+    Parameters: sequence_filename (str) - filename of the person's DNA sequence
+    profiles_filename (str) - filename of the dna database, either the CSV or compiled with --compile
+    cache_filename (str) - filename of a dna_cache.STRCountCache to reuse counts from, or None to always scan
+    false_positive_rate (float) - false positive rate of a ProfileBloomFilter to screen with, or None for none
+
+    >>> main("bob.txt", "dna_database.csv")
+    Bob
+    >>> main("alice.txt", "dna_database.csv")
+    Alice
+    >>> main("charlie.txt", "dna_database.csv")
+    Charlie
+    >>> main("nomatch.txt", "dna_database.csv")
+    No match
+    >>> main("nomatch.txt", "dna_database.csv", false_positive_rate=0.01)
+    No match
+    """
+    # Identifies and prints the names of the person corresponding to the DNA sequence given, streaming the
+    # sequence from disk so memory use does not grow with the size of the file. Only the database's header is
+    # read up front; the rest is loaded once the sequence has been counted, before the lookup is timed.
+    dna_profiles = LazyProfiles(profiles_filename, false_positive_rate)
+    if cache_filename is None:
+        mystery_profile = find_max_consecutive_in_chunks(read_dna_chunks(sequence_filename), dna_profiles.strs)
+    else:
+        import dna_cache
+        cache = dna_cache.STRCountCache(cache_filename)
+        mystery_profile = cache.count_strs(sequence_filename, dna_profiles.strs)
+        cache.close()
+    dna_profiles.load()
+    with record_phase("identify", len(dna_profiles.strs)):
+        result = dna_profiles.identify(mystery_profile)
+    print(result)
+
+def startup_report() -> str:
+    """
+    Describes how long this process took to start up: the interpreter's own start up, as the CPU time used
+    before this module ran, and then the import of this module.
+
+    Returns: (str) The report, as one line.
+
+    >>> startup_report().startswith("startup: interpreter ")
+    True
+    """
+    return (f"startup: interpreter {_interpreter_seconds * 1000:.1f} ms, "
+            f"import dna_profiler {_import_seconds * 1000:.1f} ms")
+
+def run_cli(args: list[str]) -> None:
+    """
+    This function runs the command line given, as dna_profiler.py was called with it. With --startup in front of
+    the arguments, it first prints how long this process took to start up to stderr.
+
+    Parameters: args (list) - The command line, starting with the program name.
+    """
+    if len(args) >= 2 and args[1] == "--startup":
+        print(startup_report(), file=stderr, flush=True)
+        args = args[:1] + args[2:]
+
+    if len(args) >= 4 and args[1] == "--compile":
+        compile_dna_profiles(args[2], args[3], float(args[4]) if len(args) >= 5 else 0.01)
+    elif len(args) >= 4 and args[1] == "--batch":
+        batch_main(args[2], args[3], int(args[4]) if len(args) >= 5 and args[4] else None,
+                   args[5] if len(args) >= 6 else None)
+    elif len(args) >= 3 and args[1] == "--index":
+        import dna_suffix_index
+        for sequence_filename in args[2:]:
+            print(dna_suffix_index.build_suffix_index(sequence_filename))
+    elif len(args) >= 3 and args[1] == "--discover":
+        discover_main(args[2], int(args[3]) if len(args) >= 4 else 10)
+    elif len(args) >= 3 and args[1] == "--stdin":
+        stdin_main(args[2], int(args[3]) if len(args) >= 4 else 1 << 20)
+    elif len(args) >= 4 and args[1] == "--fasta":
+        fasta_main(args[2], args[3])
+    elif len(args) >= 4 and args[1] == "--daemon":
+        import dna_daemon
+        dna_daemon.daemon_main(args[2], args[3], int(args[4]) if len(args) >= 5 else None)
+    elif len(args) >= 4 and args[1] == "--screen":
+        main(args[2], args[3], None, float(args[4]) if len(args) >= 5 else 0.01)
+    elif len(args) >= 4 and args[1] == "--stats":
+        with collect_stats() as stats:
+            main(args[2], args[3], args[4] if len(args) >= 5 else None)
+        print(stats.to_json(), file=stderr)
+    elif len(args) >= 3:
+        main(args[1], args[2], args[3] if len(args) >= 4 else None)
+    else:
+        print("Error: not enough terminal arguments specified.")
+
+_import_seconds = time.perf_counter() - _import_start_time
+
+if __name__ == "__main__":
+    # the split-out modules import dna_profiler, so let them share this copy rather than load the file again
+    modules.setdefault("dna_profiler", modules[__name__])
+    run_cli(argv)
@@ -0,0 +1,108 @@
+"""
+Module: dna_shards
+
+A profile database split into shards across worker processes, for databases too large for one process to
+hold. Each shard is a dna_profiler.ProfileIndex of the people hashed to it.
+
+Authors:
+    1) Cavin Nguyen - cavinnguyen@sandiego.edu
+    2) Sawyer Dentz - sdentz@sandiego.edu
+"""
+
+import zlib
+import multiprocessing
+from typing import Any
+
+import dna_profiler
+
+
+def _serve_shard(profiles_filename: str, shard: int, num_shards: int, connection: Any) -> None:
+    """
+    Loads one shard of a profiles CSV into a ProfileIndex and answers lookups for it until told to stop. This
+    runs in a shard's worker process. Every worker parses the whole CSV to find its own people, so sharding splits
+    the memory but not the parsing: the total CPU spent parsing grows with the number of shards.
+
+    Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+    shard (int) - Which shard this is.
+    num_shards (int) - The total number of shards.
+    connection (Connection) - The pipe that lookups arrive on and answers go back on.
+    """
+    with dna_profiler._open_profile_rows(profiles_filename) as (strs, rows):
+
+        # index only the people hashed to this shard
+        profile_index = dna_profiler.ProfileIndex(strs)
+        for name, counts in rows:
+            if zlib.crc32(name.encode("utf-8")) % num_shards == shard:
+                profile_index.add(name, counts)
+
+    # each lookup is a count tuple, answered with (up to two of) the names having those counts
+    while (counts := connection.recv()) is not None:
+        connection.send(profile_index.index.get(counts, [])[:2])
+    connection.close()
+
+
+class ShardedProfiles(dna_profiler.ProfileStore):
+    """
+    DNA profiles split into shards by a hash of each person's name, with each shard held by its own worker
+    process. No process holds the whole database, and a lookup is sent to every shard at once and the answers
+    merged.
+    """
+
+    strs: list[str]  # the STRs, in the order of the count tuples
+    _connections: list[Any]  # a pipe to each shard's worker
+    _workers: list[multiprocessing.Process]  # each shard's worker
+
+    def __init__(self, profiles_filename: str, num_shards: int) -> None:
+        """
+        Starts a worker for each shard, which loads its share of the profiles.
+
+        Parameters: profiles_filename (str) - reads in the dna data of multiple profiles
+        num_shards (int) - The number of shards.
+        """
+        with dna_profiler._open_profile_rows(profiles_filename) as (self.strs, rows):
+            pass
+
+        self._connections = []
+        self._workers = []
+        for shard in range(num_shards):
+            connection, worker_connection = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_serve_shard, daemon=True,
+                                             args=(profiles_filename, shard, num_shards, worker_connection))
+            worker.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def identify(self, mystery_profile: dict[str, int]) -> str:
+        """
+        Finds the one person whose STR counts exactly match the given profile, asking every shard in parallel.
+
+        Parameters: mystery_profile (dict) - The maximum consecutive count of each STR in the mystery sequence.
+
+        Returns: (str) The name of the matching person, or "No match" if nobody or more than one person matches.
+
+        >>> sharded = ShardedProfiles("dna_database.csv", 2)
+        >>> sharded.identify({'AGAT': 5, 'AATG': 2, 'TATC': 8}), sharded.identify({'AGAT': 1, 'AATG': 2, 'TATC': 3})
+        ('Alice', 'No match')
+        >>> dna_profiler.identify_dna(dna_profiler.read_dna_sequence("charlie.txt"), sharded)
+        'Charlie'
+        >>> sharded.close()
+        """
+        counts = tuple(mystery_profile[strs] for strs in self.strs)
+        for connection in self._connections:
+            connection.send(counts)
+        names = [name for connection in self._connections for name in connection.recv()]
+
+        # if there is only 1 possible name, return it, otherwise return "No match"
+        if len(names) == 1:
+            return names[0]
+        else:
+            return "No match"
+
+    def close(self) -> None:
+        """ Stops the shard workers. """
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for worker in self._workers:
+            worker.join()
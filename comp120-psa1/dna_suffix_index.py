@@ -0,0 +1,156 @@
+"""
+Module: dna_suffix_index
+
+Suffix indexes over dna_profiler sequence files. An index is built once per sequence, as a batch step, and
+then answers the maximum consecutive count of any STR (up to 21 bases long) without rescanning the sequence.
+
+    python dna_profiler.py --index alice.txt bob.txt
+
+Authors:
+    1) Cavin Nguyen - cavinnguyen@sandiego.edu
+    2) Sawyer Dentz - sdentz@sandiego.edu
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+import dna_profiler
+
+
+# suffix index files start with this header: magic, the number of bases each suffix was sorted on, and the length
+# of the sequence. The suffix array follows as native uint32 (or uint64 for sequences of 4 Gbp or more).
+_SUFFIX_MAGIC = b"DNASUFX2"
+_SUFFIX_HEADER = struct.Struct("=8sIQQq")  # magic, depth, sequence length, sequence file size and mtime
+_SUFFIX_DEPTH = 21
+
+# the order suffixes are sorted in: A, C, G, anything else, then T. Each base's code fits in 3 bits, so a 64-bit
+# key holds the first _SUFFIX_DEPTH bases of a suffix, and the end of the sequence (code 0) sorts first.
+_SUFFIX_ORDER = bytes.maketrans(b"ACGT", b"\1\2\3\5").translate(bytes.maketrans(
+    bytes(code for code in range(256) if code not in b"\1\2\3\5"), b"\4" * 252))
+
+
+def build_suffix_index(sequence_filename: str) -> str:
+    """
+    This function builds a suffix array over a sequence file and saves it next to the file, as a batch step ahead
+    of any STR queries. Suffixes are sorted on their first 21 bases, which is enough to answer any STR up to that
+    length with SuffixIndex. The translated sequence is saved in the index too, so SuffixIndex can memory-map
+    everything it needs from the one file.
+
+    Parameters: sequence_filename (str) - filename of the DNA sequence
+
+    Returns: (str) The filename of the saved index (the sequence filename plus ".sa").
+    """
+    np = dna_profiler.np
+    sequence = dna_profiler.read_dna_sequence(sequence_filename).encode("ascii").translate(_SUFFIX_ORDER)
+    typecode = "I" if len(sequence) < 1 << 32 else "Q"
+
+    if np is not None:
+        codes = np.frombuffer(sequence, dtype=np.uint8).astype(np.uint64)
+        keys = np.zeros(len(sequence), dtype=np.uint64)
+        for offset in range(min(_SUFFIX_DEPTH, len(sequence))):
+            keys[:len(sequence) - offset] |= codes[offset:] << np.uint64(3 * (_SUFFIX_DEPTH - 1 - offset))
+        suffixes = array(typecode, np.argsort(keys, kind="stable").astype(np.dtype(typecode)).tobytes())
+    else:
+        # roll a key along the sequence, from the last suffix back to the first
+        keys = [0] * len(sequence)
+        key = 0
+        for position in range(len(sequence) - 1, -1, -1):
+            key = key >> 3 | sequence[position] << 3 * (_SUFFIX_DEPTH - 1)
+            keys[position] = key
+        suffixes = array(typecode, sorted(range(len(sequence)), key=keys.__getitem__))
+
+    index_filename = sequence_filename + ".sa"
+    source = os.stat(sequence_filename)
+    with open(index_filename, "wb") as out_f:
+        out_f.write(_SUFFIX_HEADER.pack(_SUFFIX_MAGIC, _SUFFIX_DEPTH, len(sequence), source.st_size,
+                                        source.st_mtime_ns))
+        out_f.write(sequence)
+
+        # pad so the suffix array starts on an 8 byte boundary
+        out_f.write(b"\0" * (-out_f.tell() % 8))
+        suffixes.tofile(out_f)
+    return index_filename
+
+
+class SuffixIndex:
+    """
+    A sequence's suffix array and translated sequence, memory-mapped from the index saved by build_suffix_index.
+    Counting a new STR is then two binary searches for the block of suffixes starting with it, plus a walk over
+    just the matches found, instead of a scan of the whole sequence. Only the pages a search touches are read.
+    """
+
+    suffixes: memoryview  # the start position of every suffix, in sorted order
+    depth: int  # the number of bases each suffix was sorted on
+    length: int  # the number of bases in the sequence
+
+    def __init__(self, sequence_filename: str) -> None:
+        """
+        Memory-maps a sequence's saved suffix index.
+
+        Parameters: sequence_filename (str) - filename of the DNA sequence, indexed by build_suffix_index
+
+        Raises: ValueError - If the index is not a suffix index, or the sequence file has changed since it was
+        built.
+        """
+        with open(sequence_filename + ".sa", "rb") as in_f:
+            self._mapped = mmap.mmap(in_f.fileno(), 0, access=mmap.ACCESS_READ)
+        source = os.stat(sequence_filename)
+        header = _SUFFIX_HEADER.unpack_from(self._mapped) if len(self._mapped) >= _SUFFIX_HEADER.size else None
+        if header is None or header[0] != _SUFFIX_MAGIC or header[3:] != (source.st_size, source.st_mtime_ns):
+            self._mapped.close()
+            raise ValueError(f"{sequence_filename}.sa is not a suffix index of {sequence_filename}")
+        magic, self.depth, self.length = header[:3]
+
+        # the translated sequence comes straight after the header, then the suffix array on an 8 byte boundary
+        suffixes_start = _SUFFIX_HEADER.size + self.length
+        suffixes_start += -suffixes_start % 8
+        self.suffixes = memoryview(self._mapped)[suffixes_start:].cast("I" if self.length < 1 << 32 else "Q")
+
+    def find_max_consecutive(self, target: str) -> int:
+        """
+        Finds the maximum number of times the target STR shows up consecutively, giving the same result as
+        find_max_consecutive.
+
+        Parameters: target (str) - The STR to count, no longer than the index's depth.
+
+        Returns: (int) The maximum number of times the target STR shows up consecutively.
+
+        >>> import shutil, tempfile
+        >>> sequence_filename = shutil.copy("charlie.txt", tempfile.mkdtemp())
+        >>> build_suffix_index(sequence_filename) == sequence_filename + ".sa"
+        True
+        >>> index = SuffixIndex(sequence_filename)
+        >>> [index.find_max_consecutive(target) for target in ["AGAT", "AATG", "TATC", "GGGG"]]
+        [6, 1, 5, 1]
+        >>> index.close()
+        """
+        if len(target) > self.depth:
+            raise ValueError(f"STRs longer than {self.depth} bases cannot be answered from this index")
+        motif = target.encode("ascii").translate(_SUFFIX_ORDER)
+
+        def prefix(position: int) -> bytes:
+            """ Returns the start of a suffix, as long as the motif. """
+            start = _SUFFIX_HEADER.size + position
+            return self._mapped[start:start + min(len(motif), self.length - position)]
+
+        low = bisect_left(self.suffixes, motif, key=prefix)
+        high = bisect_right(self.suffixes, motif, lo=low, key=prefix)
+        return dna_profiler.max_consecutive_from_starts(sorted(self.suffixes[low:high]), len(target))
+
+    def find_all_max_consecutive(self, targets: list[str]) -> dict[str, int]:
+        """
+        Finds the maximum number of times each target STR shows up consecutively.
+
+        Parameters: targets (list) - The STRs to count.
+
+        Returns: (dict) A dictionary with each STR as the key and its maximum consecutive count as the value.
+        """
+        return {target: self.find_max_consecutive(target) for target in targets}
+
+    def close(self) -> None:
+        """ Releases the memory mapping. """
+        self.suffixes.release()
+        self._mapped.close()